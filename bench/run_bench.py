@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+run_bench.py
+-----------------------------------------
+Benchmarks of step1–step7 and make_photo_list.py on synthetic data.
+
+Scales (--scales, names are <years>y-<colonies>c):
+    1y-1c, 10y-1c, 10y-10c (default), 50y-1c, 50y-500c
+    or any other <years>y-<colonies>c
+
+For every scale the inputs are generated once into bench/data/<scale>/
+(seeded, see synthetic.py) and every step is timed in this process
+with its function-level API (best of --repeat runs):
+
+    step1          PDFs → CDST, parse cache cleared first
+    step1_cached   PDFs → CDST from the parse cache
+    step2 … step6  on all colonies
+    sweep          sensitivity sweep (script/sweep.py) with the default
+                   grid, all colonies
+    step7          overview figure of the first colony
+    step3_save     writing the merged table
+    logger_csv, logger_bin
+                   one 10-minute temperature logger over all years
+                   → daily table (script/loggers.py, no cache)
+    make_photo_list, make_photo_list_indexed
+                   one photo per day (+ duplicates) with EXIF dates;
+                   cold and with the EXIF index of the first run
+
+Start-up (once per run, scale "startup", a new interpreter each time):
+    startup_help          python3 run_pipeline.py --help
+    startup_import_steps  importing all step modules (what a run where
+                          every step is cached pays)
+    A start-up slower than STARTUP_LIMIT seconds is reported.
+
+Results:
+    bench/results/<timestamp>-<git rev>.json
+    The run is compared with the previous results file (or --baseline);
+    a step slower than THRESHOLD × its baseline is reported as a
+    regression (exit status 1 with --check).
+
+Usage:
+    python3 bench/run_bench.py [--scales 1y-1c 50y-500c] [--repeat 3] [--check]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_DIR / "script"))
+sys.path.insert(0, str(REPO_DIR))
+
+import synthetic
+
+DATA_DIR = BENCH_DIR / "data"
+RESULTS_DIR = BENCH_DIR / "results"
+
+DEFAULT_SCALES = ("1y-1c", "10y-1c", "10y-10c")
+START_YEAR = 2000
+MISSING_RATE = 0.3        # days without a phase record
+SST_MISSING_RATE = 0.03   # 欠測 cells
+SEED = 0
+
+# ratio to the baseline above which a step counts as a regression
+THRESHOLD = 1.25
+
+# wall time (s) above which a start-up measurement is reported
+STARTUP_LIMIT = 0.3
+
+STEP_MODULES = ["step1_extract_sst", "step2_build_dcp", "step3_merge", "step4_detect_takeover",
+                "step5_onset_temp_windows", "step6_detect_strict_takeover", "step7_plot_overview"]
+STARTUP_COMMANDS = {
+    "startup_help": ["run_pipeline.py", "--help"],
+    "startup_import_steps": ["-c", "import sys; sys.path.insert(0, 'script'); import " + ", ".join(STEP_MODULES)],
+}
+
+
+def parse_scale(name):
+    m = re.fullmatch(r"(\d+)y-(\d+)c", name)
+    if not m:
+        raise ValueError(f"Scale must look like 10y-1c, got {name!r}")
+    return int(m.group(1)), int(m.group(2))
+
+
+def prepare(name):
+    """Generate (or reuse) the inputs of a scale; returns its directory."""
+    years, colonies = parse_scale(name)
+    workdir = DATA_DIR / name
+    params = {"years": years, "colonies": colonies, "start_year": START_YEAR,
+              "missing_rate": MISSING_RATE, "sst_missing_rate": SST_MISSING_RATE, "seed": SEED}
+
+    stamp = workdir / "params.json"
+    if not stamp.exists() or json.loads(stamp.read_text()) != params:
+        print(f"[INFO] Generating inputs for {name}")
+        shutil.rmtree(workdir, ignore_errors=True)
+        synthetic.write_sst_pdfs(workdir / "temp", years, START_YEAR, SST_MISSING_RATE, SEED)
+        synthetic.write_photo_list(workdir / "photo" / "photo_list.csv", years, colonies,
+                                   START_YEAR, MISSING_RATE, SEED)
+        synthetic.write_photo_tree(workdir / "images" / "photo", years, START_YEAR, seed=SEED)
+        for suffix in (".csv", ".bin"):
+            synthetic.write_logger(workdir / "logger_data" / f"logger{suffix}", 365 * years,
+                                   f"{START_YEAR}-01-01", seed=SEED)
+        stamp.write_text(json.dumps(params))
+
+    for sub in ("output/dataset", "output/takeover_phase"):
+        (workdir / sub).mkdir(parents=True, exist_ok=True)
+    return workdir
+
+
+@contextlib.contextmanager
+def working_dir(path):
+    previous = Path.cwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def measure(func, repeat=1, setup=None):
+    """Best wall time (and its CPU time) of repeat calls; returns (wall, cpu, result)."""
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            wall0, cpu0 = time.perf_counter(), time.process_time()
+            result = func()
+            wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+        if best is None or wall < best[0]:
+            best = (wall, cpu, result)
+    return best
+
+
+def rows(result):
+    if isinstance(result, list):
+        return sum(rows(r) for r in result)
+    return None if result is None or isinstance(result, int) else len(result)
+
+
+def bench_scale(name, repeat):
+    """Time every step on one scale; returns the result records."""
+    import step1_extract_sst as step1
+    import step2_build_dcp as step2
+    import step3_merge as step3
+    import step4_detect_takeover as step4
+    import step5_onset_temp_windows as step5
+    import step6_detect_strict_takeover as step6
+    import step7_plot_overview as step7
+    import loggers
+    import sweep
+    import make_photo_list
+
+    workdir = prepare(name)
+    results = []
+
+    def run(step, func, setup=None):
+        wall, cpu, result = measure(func, repeat, setup)
+        results.append({"scale": name, "step": step, "wall_s": round(wall, 4),
+                        "cpu_s": round(cpu, 4), "rows": rows(result)})
+        print(f"  {step:<24} {wall:9.3f} s")
+        return result
+
+    print(f"[RUN] {name}")
+    with working_dir(workdir):
+        clear_cache = lambda: shutil.rmtree(step1.CACHE_DIR, ignore_errors=True)
+        cdst = run("step1", step1.build_cdst, setup=clear_cache)
+        cdst = run("step1_cached", step1.build_cdst)
+        dcp = run("step2", step2.build_dcp)
+        merged = run("step3", lambda: step3.merge_datasets(cdst, dcp))
+        run("step3_save", lambda: step3.save(merged))
+        run("step4", lambda: step4.detect_general_takeover(dcp))
+        run("step5", lambda: step5.onset_temperature_windows(merged))
+        run("step6", lambda: step6.detect_strict_takeover(merged))
+        run("sweep", lambda: sweep.sweep(merged))
+
+        for suffix in ("csv", "bin"):
+            path = Path("logger_data") / f"logger.{suffix}"
+            run(f"logger_{suffix}", lambda: loggers.daily_table(loggers.parse_logger(path)))
+
+        first = merged
+        if "colony_id" in merged.columns:
+            first = merged[merged["colony_id"] == merged["colony_id"].iloc[0]]
+        run("step7", lambda: step7.plot_overview(first, step7.TAKEOVER_DIR))
+
+    with working_dir(workdir / "images"):
+        index = Path(make_photo_list.INDEX_CSV)
+        rebuild = lambda: make_photo_list.main(["--rebuild"])
+        run("make_photo_list", rebuild, setup=lambda: index.unlink(missing_ok=True))
+        run("make_photo_list_indexed", rebuild)
+
+    return results
+
+
+def bench_startup(repeat):
+    """Start-up time of the CLI in the repository; returns the result records."""
+    results = []
+    print("[RUN] startup")
+    for step, args in STARTUP_COMMANDS.items():
+        cmd = [sys.executable, *args]
+        wall, _, _ = measure(lambda: subprocess.run(cmd, cwd=REPO_DIR, check=True,
+                                                    stdout=subprocess.DEVNULL), repeat)
+        results.append({"scale": "startup", "step": step, "wall_s": round(wall, 4),
+                        "cpu_s": None, "rows": None})
+        flag = f"  [WARN] above {STARTUP_LIMIT} s" if wall > STARTUP_LIMIT else ""
+        print(f"  {step:<24} {wall:9.3f} s{flag}")
+    return results
+
+
+def git_rev():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline_path, threshold=THRESHOLD):
+    """Print the ratio to a baseline run; returns the regressed steps."""
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    before = {(r["scale"], r["step"]): r["wall_s"] for r in baseline["results"]}
+
+    print(f"\n[INFO] Compared with {baseline_path} ({baseline['meta'].get('git_rev')})")
+    regressions = []
+    for r in results:
+        old = before.get((r["scale"], r["step"]))
+        if not old:
+            continue
+        ratio = r["wall_s"] / old
+        flag = ""
+        if ratio > threshold:
+            flag = "  [REGRESSION]"
+            regressions.append(r)
+        print(f"  {r['scale']:<10} {r['step']:<24} {old:9.3f} → {r['wall_s']:9.3f} s  ×{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic data.")
+    parser.add_argument("--scales", nargs="+", default=list(DEFAULT_SCALES),
+                        help="scales as <years>y-<colonies>c")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per step (best is kept)")
+    parser.add_argument("--baseline", type=Path, default=None,
+                        help="results file to compare with (default: the latest one)")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 on a regression")
+    args = parser.parse_args()
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    baseline = args.baseline
+    if baseline is None:
+        previous = sorted(RESULTS_DIR.glob("*.json"))
+        baseline = previous[-1] if previous else None
+
+    results = bench_startup(args.repeat)
+    for name in args.scales:
+        results.extend(bench_scale(name, args.repeat))
+
+    meta = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_rev": git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+    }
+    outfile = RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{meta['git_rev']}.json"
+    outfile.write_text(json.dumps({"meta": meta, "results": results}, indent=1), encoding="utf-8")
+    print(f"[INFO] Results → {outfile}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline)
+        if regressions and args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+synthetic.py
+-----------------------------------------
+Synthetic, seeded inputs for the benchmarks.
+
+    write_sst_pdfs()   monthly SST PDFs in the temp/ layout
+                       (日 波浮口 若郷 野伏 ... , 欠測 for missing cells)
+    write_photo_list() phase records (photo_id, date, phase[, colony_id])
+    write_photo_tree() tiny JPEGs with an EXIF DateTimeOriginal
+    write_logger()     10-minute temperature logger file (.csv or .bin,
+                       see script/loggers.py)
+
+The PDFs are written directly (one page, CID font HeiseiKakuGo-W5 with
+UniJIS-UCS2-H, no embedded font program), so no PDF library is needed;
+pdfplumber reads them like the real files.
+
+The same arguments always produce the same files.
+"""
+
+import calendar
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+STATIONS = ["波浮口", "若郷", "野伏", "岡田", "元町"]
+PHASES = np.array(["o", "p", "t"])
+
+# Daily phase transitions (rows: from o, p, t)
+TRANSITIONS = np.array([
+    [0.97, 0.02, 0.01],
+    [0.05, 0.85, 0.10],
+    [0.07, 0.03, 0.90],
+])
+
+
+def _hex(text):
+    return "<" + text.encode("utf-16-be").hex().upper() + ">"
+
+
+def pdf_bytes(lines):
+    """One-page PDF with the given (x, y, text) lines."""
+    ops = ["BT", "/F1 9 Tf"]
+    ops += [f"1 0 0 1 {x} {y} Tm {_hex(text)} Tj" for x, y, text in lines]
+    ops.append("ET")
+    stream = "\n".join(ops).encode("latin-1")
+
+    objs = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type0 /BaseFont /HeiseiKakuGo-W5 "
+        b"/Encoding /UniJIS-UCS2-H /DescendantFonts [6 0 R] >>",
+        b"<< /Type /Font /Subtype /CIDFontType0 /BaseFont /HeiseiKakuGo-W5 "
+        b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Japan1) /Supplement 2 >> "
+        b"/FontDescriptor 7 0 R /DW 1000 /W [1 95 500] >>",
+        b"<< /Type /FontDescriptor /FontName /HeiseiKakuGo-W5 /Flags 4 "
+        b"/FontBBox [0 -200 1000 900] /ItalicAngle 0 /Ascent 880 /Descent -120 "
+        b"/CapHeight 700 /StemV 80 >>",
+    ]
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+
+def write_sst_pdf(path, year, month, missing_rate=0.03, seed=0):
+    """One monthly SST PDF: seasonal temperatures of every station."""
+    rng = np.random.default_rng([seed, year, month])
+    ndays = calendar.monthrange(year, month)[1]
+
+    lines = [(40, 800, f"{year}年{month}月 水温"), (40, 780, "日")]
+    lines += [(80 + 60 * k, 780, name) for k, name in enumerate(STATIONS)]
+
+    y = 780
+    for day in range(1, ndays + 1):
+        y -= 14
+        doy = date(year, month, day).timetuple().tm_yday
+        lines.append((40, y, str(day)))
+        for k in range(len(STATIONS)):
+            if rng.random() < missing_rate:
+                value = "欠測"
+            else:
+                sst = 20 + 5 * np.sin(2 * np.pi * (doy - 120) / 365) + 0.5 * k + rng.normal(0, 0.4)
+                value = f"{sst:.1f}"
+            lines.append((80 + 60 * k, y, value))
+
+    Path(path).write_bytes(pdf_bytes(lines))
+
+
+def write_sst_pdfs(outdir, years, start_year=2000, missing_rate=0.03, seed=0):
+    """Monthly PDFs (YYYY.MM.pdf) for the given number of years."""
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for year in range(start_year, start_year + years):
+        for month in range(1, 13):
+            path = outdir / f"{year}.{month:02d}.pdf"
+            write_sst_pdf(path, year, month, missing_rate, seed)
+            paths.append(path)
+    return paths
+
+
+def phase_series(days, colonies=1, missing_rate=0.3, seed=0):
+    """
+    Phase letters (days × colonies) from a daily Markov chain;
+    days without a photograph are "".
+    """
+    rng = np.random.default_rng(seed)
+    cumulative = TRANSITIONS.cumsum(axis=1)
+
+    state = np.zeros(colonies, dtype=int)
+    out = np.empty((days, colonies), dtype=int)
+    for i in range(days):
+        u = rng.random(colonies)
+        state = (u[:, None] > cumulative[state]).sum(axis=1)
+        out[i] = state
+
+    letters = PHASES[out]
+    letters[rng.random((days, colonies)) < missing_rate] = ""
+    return letters
+
+
+def write_photo_list(path, years, colonies=1, start_year=2000, missing_rate=0.3, seed=0):
+    """
+    photo_list.csv with phases filled in. A colony_id column is added
+    when there is more than one colony.
+    """
+    dates = pd.date_range(f"{start_year}-01-01", f"{start_year + years - 1}-12-31", freq="D")
+    letters = phase_series(len(dates), colonies, missing_rate, seed)
+
+    day, colony = np.nonzero(letters != "")
+    df = pd.DataFrame({
+        "photo_id": [f"C{c:03d}_{d:%Y%m%d}.JPG" for c, d in zip(colony, dates[day])],
+        "date": dates[day].strftime("%Y%m%d"),
+        "phase": letters[day, colony],
+    })
+    if colonies > 1:
+        df["colony_id"] = [f"C{c:03d}" for c in colony]
+        df = df.sort_values(["colony_id", "date"], kind="stable")
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(path, index=False)
+    return len(df)
+
+
+def write_photo_tree(outdir, years, start_year=2000, duplicate_rate=0.05, seed=0):
+    """One small JPEG per day (a second one on some days) with EXIF dates."""
+    from PIL import Image, ExifTags
+
+    rng = np.random.default_rng(seed)
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    image = Image.new("RGB", (8, 8), (40, 90, 120))
+    day = date(start_year, 1, 1)
+    end = date(start_year + years, 1, 1)
+    count = 0
+
+    while day < end:
+        for k in range(1 + (rng.random() < duplicate_rate)):
+            exif = Image.Exif()
+            exif.get_ifd(ExifTags.IFD.Exif)[0x9003] = f"{day:%Y:%m:%d} 10:{k:02d}:00"
+            image.save(outdir / f"IMG_{day:%Y%m%d}_{k}.JPG", exif=exif)
+            count += 1
+        day += timedelta(days=1)
+
+    return count
+
+
+def logger_records(days, start="2000-01-01", interval_minutes=10, seed=0):
+    """Timestamps (datetime64[s]) and temperatures of a logger: season + daily cycle + noise."""
+    rng = np.random.default_rng(seed)
+    step = np.timedelta64(interval_minutes, "m")
+    times = np.arange(np.datetime64(start, "s"), np.datetime64(start, "s") + np.timedelta64(days, "D"), step)
+
+    doy = (times - times.astype("datetime64[Y]")).astype("timedelta64[s]").astype(float) / 86400
+    hour = (times - times.astype("datetime64[D]")).astype("timedelta64[s]").astype(float) / 3600
+    temp = (20 + 5 * np.sin(2 * np.pi * (doy - 120) / 365) + 0.6 * np.sin(2 * np.pi * (hour - 9) / 24)
+            + rng.normal(0, 0.2, len(times)))
+    return times, temp
+
+
+def write_logger(path, days, start="2000-01-01", interval_minutes=10, seed=0):
+    """Logger file (.csv: timestamp,temperature; .bin: int64 seconds + float32)."""
+    times, temp = logger_records(days, start, interval_minutes, seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if path.suffix == ".bin":
+        records = np.empty(len(times), dtype=[("time", "<i8"), ("temp", "<f4")])
+        records["time"] = times.astype(np.int64)
+        records["temp"] = temp
+        records.tofile(path)
+    else:
+        pd.DataFrame({
+            "timestamp": np.datetime_as_string(times, unit="s"),
+            "temperature": np.round(temp, 3),
+        }).assign(timestamp=lambda d: d["timestamp"].str.replace("T", " ")).to_csv(path, index=False)
+    return len(times)
@@ -9,7 +9,7 @@ Usage:
     1. Create a folder named 'photo' in the current directory.
     2. Put all image files (JPG, PNG, TIFF, BMP, etc.) into ./photo.
     3. Run this script:
-           python3 make_photo_list.py
+           python3 make_photo_list.py [--rebuild] [--pick]
 
 This script scans ./photo, extracts shooting dates from EXIF
 (DateTimeOriginal) when available, or extracts YYYYMMDD from
@@ -25,39 +25,169 @@ Columns:
                  the same date → "duplication" is inserted.
                  (User must manually keep only one record.)
 
+Representative photos (--pick):
+    Instead of marking duplications, the sharpest photo of each date is
+    kept and the others are left out of the list. Sharpness is the
+    variance of the Laplacian of a grey thumbnail (long edge
+    SHARPNESS_SIZE px; JPEGs are decoded at reduced scale), computed in
+    a thread pool. All candidates, their scores and the chosen photo are
+    written to ./photo/photo_duplicates.csv. When appending, dates that
+    already have a row are left as they are.
+
+Existing list:
+    If ./photo/photo_list.csv already exists, only photos that are not
+    in it yet are appended (sorted in by date). Existing rows and the
+    phases entered in them are kept as they are; an empty phase becomes
+    "duplication" when a new photo has the same date. Rows of photos
+    that were deleted are kept. --rebuild writes a new list from
+    scratch (all entered phases are lost).
+
 Supported image formats (case-insensitive):
     JPG, JPEG, PNG, TIF, TIFF, BMP
+
+EXIF index:
+    EXIF dates are remembered in ./photo/.photo_index.csv, keyed by
+    filename, size and modification time. Only new or modified images
+    are opened again (in a thread pool, header only — pixel data is never
+    decoded). Renamed files are recognised by their size and mtime;
+    deleted files are dropped from the index. While a large folder is
+    scanned, the index is saved every CHECKPOINT_EVERY images and when
+    the scan is interrupted, so the next run continues where it stopped.
+
+All files are written under a temporary name and renamed into place,
+so an interrupted run never leaves a half-written photo_list.csv.
+
+Timing of each EXIF read (and sharpness score) is written to
+output/reports/make_photo_list_report.json / .csv.
 """
 
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from PIL import Image
-from PIL.ExifTags import TAGS
 import re
-import pandas as pd
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "script"))
+from lazy import lazy_import
+from profiling import record, timed_call, write_report
+from storage import atomic_write
+
+pd = lazy_import("pandas")
 
 
 PHOTO_DIR = Path("photo")
 OUTPUT_CSV = PHOTO_DIR / "photo_list.csv"
+INDEX_CSV = PHOTO_DIR / ".photo_index.csv"
+DUPLICATES_CSV = PHOTO_DIR / "photo_duplicates.csv"
 VALID_EXT = [".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp"]
 
+INDEX_COLUMNS = ["photo_id", "size", "mtime_ns", "exif_date"]
+
+# EXIF tag id of DateTimeOriginal
+DATETIME_ORIGINAL = 0x9003
+
+# Long edge (px) of the thumbnail the sharpness score is computed on
+SHARPNESS_SIZE = 256
+
+# Images read between two saves of the EXIF index
+CHECKPOINT_EVERY = 500
+
 
 def get_exif_date(img_path):
     """Extract DateTimeOriginal (YYYY:MM:DD HH:MM:SS) → YYYYMMDD."""
+    from PIL import ExifTags, Image
+
     try:
-        img = Image.open(img_path)
-        exif = img._getexif()
-        if exif is None:
-            return None
-
-        for tag_id, value in exif.items():
-            tag = TAGS.get(tag_id, tag_id)
-            if tag == "DateTimeOriginal":
-                # Format example: "2023:08:15 12:33:01"
-                return value.split(" ")[0].replace(":", "")
+        # Image.open only parses the header; the pixels are not decoded
+        with Image.open(img_path) as img:
+            exif = img.getexif()
+            value = exif.get_ifd(ExifTags.IFD.Exif).get(DATETIME_ORIGINAL)
+            if value is None:
+                value = exif.get(DATETIME_ORIGINAL)
     except Exception:
         return None
 
-    return None
+    if not value:
+        return None
+
+    # Format example: "2023:08:15 12:33:01"
+    return str(value).split(" ")[0].replace(":", "")
+
+
+def load_index(path=INDEX_CSV):
+    """{photo_id: (size, mtime_ns, exif_date)} from the EXIF index."""
+    if not path.exists():
+        return {}
+
+    df = pd.read_csv(path, dtype={"photo_id": str, "exif_date": str}, keep_default_na=False)
+    return {
+        r.photo_id: (int(r.size), int(r.mtime_ns), r.exif_date or None)
+        for r in df.itertuples(index=False)
+    }
+
+
+def save_index(index, path=INDEX_CSV):
+    rows = [[name, size, mtime, date or ""] for name, (size, mtime, date) in sorted(index.items())]
+    with atomic_write(path) as tmp:
+        pd.DataFrame(rows, columns=INDEX_COLUMNS).to_csv(tmp, index=False, encoding="utf-8")
+
+
+def write_csv(df, path):
+    with atomic_write(path) as tmp:
+        df.to_csv(tmp, index=False, encoding="utf-8")
+
+
+def scan_exif_dates(images, index, jobs=None, checkpoint=None):
+    """
+    EXIF date of every image, reusing index entries whose size and mtime
+    still match. Returns ({photo_id: exif_date or None}, new index).
+    checkpoint(index so far) is called every CHECKPOINT_EVERY images read
+    and when the scan is interrupted.
+    """
+    new_index = {}
+    misses = []
+
+    # entries of files that disappeared (candidates for renames)
+    names = {p.name for p in images}
+    vanished = {
+        (size, mtime): date
+        for name, (size, mtime, date) in index.items() if name not in names
+    }
+
+    for img_path in images:
+        st = img_path.stat()
+        stamp = (st.st_size, st.st_mtime_ns)
+        entry = index.get(img_path.name)
+
+        if entry is not None and entry[:2] == stamp:
+            new_index[img_path.name] = entry
+        elif entry is None and stamp in vanished:
+            new_index[img_path.name] = stamp + (vanished.pop(stamp),)
+        else:
+            misses.append((img_path, stamp))
+
+    if misses:
+        print(f"[INFO] Reading EXIF of {len(misses)} new or modified images "
+              f"({len(images) - len(misses)} from index)")
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            dates = pool.map(partial(timed_call, get_exif_date), [p for p, _ in misses])
+            try:
+                for k, ((img_path, stamp), (date, wall, cpu)) in enumerate(zip(misses, dates), 1):
+                    new_index[img_path.name] = stamp + (date,)
+                    record("exif_read", wall, cpu, item=img_path.name)
+                    if checkpoint is not None and k % CHECKPOINT_EVERY == 0 and k < len(misses):
+                        checkpoint(new_index)
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                if checkpoint is not None:
+                    print(f"[WARNING] Scan interrupted; saving the {len(new_index)} index entries read so far")
+                    checkpoint(new_index)
+                raise
+
+    return {name: entry[2] for name, entry in new_index.items()}, new_index
 
 
 def extract_date_from_filename(fname):
@@ -66,7 +196,86 @@ def extract_date_from_filename(fname):
     return m.group(1) if m else None
 
 
-def main():
+def sharpness(img_path, size=SHARPNESS_SIZE):
+    """Variance of the Laplacian of a downscaled grey image (higher = sharper)."""
+    from PIL import Image
+
+    try:
+        with Image.open(img_path) as img:
+            img.draft("L", (size, size))   # JPEG: decode at 1/2 … 1/8 scale
+            img = img.convert("L")
+            img.thumbnail((size, size))
+            a = np.asarray(img, dtype=float)
+    except Exception:
+        return None
+
+    if min(a.shape) < 3:
+        return None
+    lap = a[:-2, 1:-1] + a[2:, 1:-1] + a[1:-1, :-2] + a[1:-1, 2:] - 4 * a[1:-1, 1:-1]
+    return float(lap.var())
+
+
+def pick_representatives(df, jobs=None):
+    """
+    Keep the sharpest photo of every date that has several.
+    Returns (df with one row per date, table of the duplicate candidates
+    with their sharpness and which one was selected).
+    """
+    dup = df["date"].duplicated(keep=False)
+    candidates = df[dup].copy()
+    if candidates.empty:
+        return df, candidates
+
+    print(f"[INFO] Scoring sharpness of {len(candidates)} photos on "
+          f"{candidates['date'].nunique()} duplicated dates")
+    scores = []
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        paths = [PHOTO_DIR / name for name in candidates["photo_id"]]
+        for path, (score, wall, cpu) in zip(paths, pool.map(partial(timed_call, sharpness), paths)):
+            record("sharpness", wall, cpu, item=path.name)
+            scores.append(score)
+    candidates["sharpness"] = scores
+
+    # unreadable images score lowest; on a tie the first photo is kept
+    best = candidates["sharpness"].fillna(-1.0).groupby(candidates["date"]).idxmax()
+    candidates["selected"] = candidates.index.isin(best)
+    return df[~dup | df.index.isin(best)], candidates
+
+
+def append_to_list(existing, df):
+    """
+    Add the photos of df that are not in the existing list yet.
+    Returns (combined list sorted by date, number of photos added).
+    """
+    new = df[~df["photo_id"].isin(existing["photo_id"])].copy()
+    if new.empty:
+        return existing, 0
+
+    # dates that now have more than one photo
+    counts = pd.concat([existing["date"], new["date"]]).value_counts()
+    dup_dates = counts.index[counts > 1]
+
+    new["phase"] = ""
+    new.loc[new["date"].isin(dup_dates), "phase"] = "duplication"
+
+    # annotated rows are never changed
+    existing = existing.copy()
+    blank = existing["phase"].str.strip() == ""
+    existing.loc[blank & existing["date"].isin(new["date"]) & existing["date"].isin(dup_dates),
+                 "phase"] = "duplication"
+
+    combined = pd.concat([existing, new], ignore_index=True).fillna("")
+    return combined.sort_values("date", kind="stable").reset_index(drop=True), len(new)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create or update photo/photo_list.csv.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="write a new list instead of appending new photos (entered phases are lost)")
+    parser.add_argument("--pick", action="store_true",
+                        help="keep only the sharpest photo of each date instead of marking duplications")
+    args = parser.parse_args(argv)
+
     if not PHOTO_DIR.exists():
         print("[ERROR] './photo' directory does not exist.")
         print("Create the folder and place images inside it.")
@@ -82,13 +291,17 @@ def main():
         return
 
     records = []
+    started = time.perf_counter()
 
     # ---------- Extract dates ----------
+    exif_dates, index = scan_exif_dates(images, load_index(), checkpoint=save_index)
+    save_index(index)
+
     for img_path in images:
         fname = img_path.name
 
         # 1) Try EXIF
-        date_str = get_exif_date(img_path)
+        date_str = exif_dates[fname]
 
         # 2) If EXIF missing, try filename
         if date_str is None:
@@ -105,23 +318,51 @@ def main():
         return
 
     # ---------- Convert to DataFrame for sorting ----------
-    df = pd.DataFrame(records)
-
-    # Sort by date ascending
-    df = df.sort_values("date").reset_index(drop=True)
+    df = pd.DataFrame(records).sort_values("date", kind="stable").reset_index(drop=True)
+
+    existing = None
+    if OUTPUT_CSV.exists() and not args.rebuild:
+        existing = pd.read_csv(OUTPUT_CSV, dtype=str, keep_default_na=False)
+        if not {"photo_id", "date", "phase"}.issubset(existing.columns):
+            print(f"[ERROR] {OUTPUT_CSV} must contain columns: photo_id, date, phase (use --rebuild)")
+            return
+
+    # ---------- Representative photo per date ----------
+    if args.pick:
+        if existing is not None:
+            # dates already in the list keep their row
+            df = df[~df["date"].isin(existing["date"])]
+        df, candidates = pick_representatives(df)
+        if len(candidates):
+            write_csv(candidates, DUPLICATES_CSV)
+            print(f"[INFO] Kept the sharpest of each duplicated date; "
+                  f"{len(candidates) - candidates['selected'].sum()} photos left out → {DUPLICATES_CSV}")
+
+    # ---------- Append to the existing list ----------
+    if existing is not None:
+        combined, added = append_to_list(existing, df)
+        if added:
+            write_csv(combined, OUTPUT_CSV)
+        print(f"\n[INFO] Added {added} new photos to {OUTPUT_CSV.resolve()} ({len(combined)} rows)")
+
+        record("make_photo_list", time.perf_counter() - started, rows_in=len(images), rows_out=added)
+        write_report("make_photo_list_report", images=len(images))
+        return
 
-    # Mark duplications
+    # Mark duplications (every photo of a date that has several)
+    df = df.reset_index(drop=True)
     df["phase"] = ""
-    dup_dates = df["date"].value_counts()
-    for d, count in dup_dates.items():
-        if count > 1:
-            df.loc[df["date"] == d, "phase"] = "duplication"
+    df.loc[df["date"].duplicated(keep=False), "phase"] = "duplication"
 
     # ---------- Save CSV inside ./photo ----------
-    df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8")
+    write_csv(df, OUTPUT_CSV)
 
     print(f"\n[INFO] Created photo list → {OUTPUT_CSV.resolve()}")
-    print("[INFO] Rows with 'duplication' must be manually reduced.\n")
+    if (df["phase"] == "duplication").any():
+        print("[INFO] Rows with 'duplication' must be manually reduced.\n")
+
+    record("make_photo_list", time.perf_counter() - started, rows_in=len(images), rows_out=len(df))
+    write_report("make_photo_list_report", images=len(images))
 
 
 if __name__ == "__main__":
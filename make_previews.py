@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+make_previews.py
+-----------------------------------------------------
+
+Previews for entering the phases in photo_list.csv.
+
+Usage:
+    1. Create ./photo/photo_list.csv with make_photo_list.py.
+    2. Run this script:
+           python3 make_previews.py [--size 320] [--jobs N] [--no-sheets] [--no-html]
+
+Thumbnail cache:
+    Every photo of photo_list.csv is decoded once into a small JPEG
+    (long edge --size px, EXIF orientation applied) in
+    ./photo/.thumbs/<sha256 of the photo>_<size>.jpg. Photos are hashed
+    only when they are new or their size / mtime changed
+    (./photo/.thumbs/index.csv); renamed photos reuse their thumbnail.
+    Missing thumbnails are made in a process pool. Thumbnails not used
+    by the run (photos no longer listed, another --size) are deleted.
+
+Output (./output/previews/):
+    index.html                 all rows of photo_list.csv by month:
+                               row number, date, photo_id, phase and the
+                               thumbnail (click → original photo)
+    sheet_<YYYY-MM>_<k>.jpg    contact sheets of COLUMNS × ROWS
+                               thumbnails per month, captioned with the
+                               row number, date, phase and photo_id
+
+Row numbers are the positions in photo_list.csv (1 = first data row).
+
+Timing of each thumbnail is written to
+output/reports/make_previews_report.json / .csv.
+"""
+
+import argparse
+import html
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "script"))
+from lazy import lazy_import
+from manifest import file_sha256
+from profiling import record, timed_call, write_report
+from storage import atomic_write
+
+pd = lazy_import("pandas")
+
+
+PHOTO_DIR = Path("photo")
+PHOTO_LIST = PHOTO_DIR / "photo_list.csv"
+THUMB_DIR = PHOTO_DIR / ".thumbs"
+THUMB_INDEX = THUMB_DIR / "index.csv"
+PREVIEW_DIR = Path("output/previews")
+
+INDEX_COLUMNS = ["photo_id", "size", "mtime_ns", "sha256"]
+
+# Long edge (px) of the thumbnails
+THUMB_SIZE = 320
+JPEG_QUALITY = 80
+
+# Contact sheet layout
+COLUMNS = 8
+ROWS = 6
+CAPTION_HEIGHT = 30
+BACKGROUND = (255, 255, 255)
+PLACEHOLDER = (200, 200, 200)
+
+
+def load_index(path=THUMB_INDEX):
+    """{photo_id: (size, mtime_ns, sha256)} from the thumbnail index."""
+    if not path.exists():
+        return {}
+
+    df = pd.read_csv(path, dtype={"photo_id": str, "sha256": str})
+    return {r.photo_id: (int(r.size), int(r.mtime_ns), r.sha256) for r in df.itertuples(index=False)}
+
+
+def save_index(index, path=THUMB_INDEX):
+    rows = [[name, size, mtime, digest] for name, (size, mtime, digest) in sorted(index.items())]
+    with atomic_write(path) as tmp:
+        pd.DataFrame(rows, columns=INDEX_COLUMNS).to_csv(tmp, index=False, encoding="utf-8")
+
+
+def photo_digests(paths, index):
+    """
+    SHA-256 of every photo, reusing index entries whose size and mtime
+    still match. Returns ({photo_id: sha256}, new index).
+    """
+    new_index = {}
+    for path in paths:
+        st = path.stat()
+        stamp = (st.st_size, st.st_mtime_ns)
+        entry = index.get(path.name)
+        if entry is None or entry[:2] != stamp:
+            entry = stamp + (file_sha256(path),)
+        new_index[path.name] = entry
+
+    return {name: entry[2] for name, entry in new_index.items()}, new_index
+
+
+def thumb_path(digest, size=THUMB_SIZE):
+    return THUMB_DIR / f"{digest}_{size}.jpg"
+
+
+def make_thumbnail(src, dest, size=THUMB_SIZE):
+    """Write a downscaled JPEG of src to dest. Returns False if src cannot be read."""
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(src) as img:
+            img.draft("RGB", (size, size))   # JPEG: decode at 1/2 … 1/8 scale
+            thumb = ImageOps.exif_transpose(img).convert("RGB")
+        thumb.thumbnail((size, size))
+    except Exception:
+        return False
+
+    # an interrupted run leaves no broken thumbnail
+    with atomic_write(dest) as tmp:
+        thumb.save(tmp, "JPEG", quality=JPEG_QUALITY)
+    return True
+
+
+def build_thumbnails(paths, size=THUMB_SIZE, jobs=None):
+    """
+    Thumbnail of every photo (cached by content hash).
+    Returns {photo_id: thumbnail path or None}.
+    """
+    THUMB_DIR.mkdir(parents=True, exist_ok=True)
+    digests, index = photo_digests(paths, load_index())
+    save_index(index)
+
+    thumbs = {p.name: thumb_path(digests[p.name], size) for p in paths}
+    misses = {}
+    for path in paths:
+        dest = thumbs[path.name]
+        if not dest.exists():
+            misses.setdefault(dest, path)   # identical photos share one thumbnail
+
+    print(f"[INFO] {len(paths) - len(misses)} thumbnails from cache, {len(misses)} to make")
+
+    if misses:
+        srcs, dests = list(misses.values()), list(misses)
+        work = partial(timed_call, make_thumbnail)
+        if len(misses) > 1 and (jobs is None or jobs > 1):
+            with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+                results = list(pool.map(work, srcs, dests, [size] * len(srcs)))
+        else:
+            results = [work(src, dest, size) for src, dest in zip(srcs, dests)]
+
+        for src, dest, (ok, wall, cpu) in zip(srcs, dests, results):
+            record("thumbnail", wall, cpu, item=src.name)
+            if not ok:
+                print(f"[WARNING] Could not read image: {src.name}")
+
+    # drop thumbnails not used by this run
+    used = set(thumbs.values())
+    for old in THUMB_DIR.glob("*.jpg"):
+        if old not in used:
+            old.unlink()
+
+    return {name: (path if path.exists() else None) for name, path in thumbs.items()}
+
+
+def read_photo_list(path=PHOTO_LIST):
+    """photo_list.csv with its row numbers and a month column."""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    df.insert(0, "row", range(1, len(df) + 1))
+    df["month"] = df["date"].str[:4] + "-" + df["date"].str[4:6]
+    return df
+
+
+def contact_sheets(rows, thumbs, outdir=PREVIEW_DIR, size=THUMB_SIZE):
+    """Write the contact sheets of every month; returns their paths."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    font = ImageFont.load_default()
+    cell_w, cell_h = size, size + CAPTION_HEIGHT
+    per_sheet = COLUMNS * ROWS
+    written = []
+
+    for old in outdir.glob("sheet_*.jpg"):
+        old.unlink()
+
+    for month, part in rows.groupby("month", sort=False):
+        for k, start in enumerate(range(0, len(part), per_sheet), 1):
+            chunk = part.iloc[start:start + per_sheet]
+            nrows = -(-len(chunk) // COLUMNS)
+            sheet = Image.new("RGB", (COLUMNS * cell_w, nrows * cell_h), BACKGROUND)
+            draw = ImageDraw.Draw(sheet)
+
+            for i, r in enumerate(chunk.itertuples(index=False)):
+                x, y = (i % COLUMNS) * cell_w, (i // COLUMNS) * cell_h
+                thumb = thumbs.get(r.photo_id)
+                if thumb is None:
+                    draw.rectangle([x + 4, y + 4, x + cell_w - 5, y + size - 5], fill=PLACEHOLDER)
+                    draw.text((x + 10, y + 10), "missing", fill=(0, 0, 0), font=font)
+                else:
+                    with Image.open(thumb) as img:
+                        sheet.paste(img, (x + (size - img.width) // 2, y + (size - img.height) // 2))
+
+                caption = f"#{r.row}  {r.date}  {r.phase or '-'}"
+                draw.text((x + 4, y + size + 2), caption, fill=(0, 0, 0), font=font)
+                draw.text((x + 4, y + size + 15), r.photo_id, fill=(90, 90, 90), font=font)
+
+            path = outdir / f"sheet_{month}_{k}.jpg"
+            with atomic_write(path) as tmp:
+                sheet.save(tmp, "JPEG", quality=JPEG_QUALITY)
+            written.append(path)
+
+    return written
+
+
+def write_html(rows, thumbs, outdir=PREVIEW_DIR, size=THUMB_SIZE):
+    """Static viewer of photo_list.csv by month; returns its path."""
+    def link(path):
+        return html.escape(Path(os.path.relpath(path, outdir)).as_posix())
+
+    parts = [
+        "<!DOCTYPE html>",
+        '<html><head><meta charset="utf-8"><title>photo_list.csv</title>',
+        "<style>",
+        "body{font-family:sans-serif;margin:1em}",
+        f".grid{{display:grid;grid-template-columns:repeat(auto-fill,{size + 10}px);gap:6px}}",
+        ".cell{border:1px solid #ccc;padding:4px;font-size:12px}",
+        f".cell img{{max-width:{size}px;max-height:{size}px;display:block}}",
+        ".o{background:#dfe}.p{background:#ffd}.t{background:#fdd}.duplication{background:#ddf}",
+        "</style></head><body>",
+        f"<h1>{html.escape(str(PHOTO_LIST))}</h1>",
+    ]
+
+    for month, part in rows.groupby("month", sort=False):
+        parts.append(f'<h2 id="{month}">{month} ({len(part)})</h2><div class="grid">')
+        for r in part.itertuples(index=False):
+            thumb = thumbs.get(r.photo_id)
+            image = f'<img src="{link(thumb)}" loading="lazy" alt="">' if thumb else "<p>missing</p>"
+            parts.append(
+                f'<div class="cell {html.escape(r.phase)}"><a href="{link(PHOTO_DIR / r.photo_id)}">{image}</a>'
+                f"#{r.row} {r.date} <b>{html.escape(r.phase) or '-'}</b><br>{html.escape(r.photo_id)}</div>"
+            )
+        parts.append("</div>")
+
+    parts.append("</body></html>")
+    path = outdir / "index.html"
+    with atomic_write(path) as tmp:
+        tmp.write_text("\n".join(parts), encoding="utf-8")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Thumbnails, contact sheets and an HTML viewer of photo_list.csv.")
+    parser.add_argument("--size", type=int, default=THUMB_SIZE, help="long edge of the thumbnails (px)")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes for new thumbnails")
+    parser.add_argument("--no-sheets", action="store_true", help="do not write contact sheets")
+    parser.add_argument("--no-html", action="store_true", help="do not write index.html")
+    args = parser.parse_args(argv)
+
+    if not PHOTO_LIST.exists():
+        print(f"[ERROR] {PHOTO_LIST} does not exist. Run make_photo_list.py first.")
+        return
+
+    started = time.perf_counter()
+    rows = read_photo_list()
+    paths = [PHOTO_DIR / name for name in rows["photo_id"].drop_duplicates() if (PHOTO_DIR / name).is_file()]
+    if len(paths) < rows["photo_id"].nunique():
+        print(f"[WARNING] {rows['photo_id'].nunique() - len(paths)} listed photos not found in ./photo")
+
+    thumbs = build_thumbnails(paths, args.size, args.jobs)
+
+    PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
+    if not args.no_sheets:
+        sheets = contact_sheets(rows, thumbs, size=args.size)
+        print(f"[INFO] {len(sheets)} contact sheets → {PREVIEW_DIR.resolve()}")
+    if not args.no_html:
+        page = write_html(rows, thumbs, size=args.size)
+        print(f"[INFO] Viewer → {page.resolve()}")
+
+    record("make_previews", time.perf_counter() - started, rows_in=len(rows))
+    write_report("make_previews_report", photos=len(paths))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,45 +2,516 @@
 # -*- coding: utf-8 -*-
 
 """
-Run all analysis steps sequentially.
+Run all analysis steps.
 Each step is defined in its own script in script/.
 Renamed to a clear monotonic order: step1 → step7.
+
+By default the steps are imported once and run in this process:
+DataFrames are passed from step to step in memory, and the outputs of
+each step are written (atomically) as soon as it completes.
+
+    python3 run_pipeline.py                      # in-process (default)
+    python3 run_pipeline.py --skip-intermediates # only write takeover_phase/
+    python3 run_pipeline.py --force              # ignore the step cache
+    python3 run_pipeline.py --parallel [--jobs N] # independent steps at once
+    python3 run_pipeline.py --subprocess         # one python3 per step (legacy)
+    python3 run_pipeline.py --streaming          # bounded memory, chunk by chunk
+    python3 run_pipeline.py --format parquet     # typed binary tables (needs pyarrow)
+    python3 run_pipeline.py --profile step1      # cProfile dump of one step
+    python3 run_pipeline.py --batch colonies.csv # many colonies in parallel
+    python3 run_pipeline.py --append             # recompute only the new tail
+
+Each step starts as soon as the steps it depends on are done (see
+script/scheduler.py); with --parallel, independent steps run at the
+same time in worker processes. The critical path (longest chain of
+dependent steps) is printed after the run.
+
+Every run writes a timing report (wall/CPU time, peak memory, rows in
+and out per step, per-PDF parse and figure save times) to
+output/reports/run_report.json and .csv.
+
+Steps whose script, the script/ modules it imports and its declared
+inputs are unchanged since the last run (see output/manifest.json) are skipped; their tables are read back
+from disk only if a later step needs them. The subprocess and
+streaming modes always run every step.
+
+Resuming: the manifest is saved after every completed step, so a run
+that fails, is interrupted (Ctrl-C, SIGTERM) or killed continues at the
+step where it stopped; step1 also keeps every PDF parsed so far in its
+parse cache.
 """
 
+import argparse
+import ast
+import hashlib
+import importlib
+import signal
 import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 
+SCRIPT_DIR = Path("script")
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from manifest import Manifest, expand, frame_fingerprint
+import profiling
+import scheduler
+import storage
+
 SCRIPTS = [
-    "step1_extract_sst.py",            
-    "step2_build_dcp.py",             
-    "step3_merge.py",                 
-    "step4_detect_takeover.py",       
-    "step5_onset_temp_windows.py",    
+    "step1_extract_sst.py",
+    "step2_build_dcp.py",
+    "step3_merge.py",
+    "step4_detect_takeover.py",
+    "step5_onset_temp_windows.py",
     "step6_detect_strict_takeover.py",
-    "step7_plot_overview.py",         
+    "step7_plot_overview.py",
 ]
 
-def main():
-    script_dir = Path("script")
+# In-process pipeline:
+#   (script, function, input tables, output table)
+# Each function receives the named input DataFrames and returns the
+# output DataFrame (or None for steps that only draw figures). A step
+# with more output files returns (DataFrame, keyword arguments of save()).
+STEPS = [
+    ("step1_extract_sst.py", "build", [], "cdst"),
+    ("step2_build_dcp.py", "build_dcp", [], "dcp"),
+    ("step3_merge.py", "merge_datasets", ["cdst", "dcp"], "merged"),
+    ("step4_detect_takeover.py", "detect_general_takeover", ["dcp"], "general"),
+    ("step5_onset_temp_windows.py", "onset_temperature_windows", ["merged"], "onset"),
+    ("step6_detect_strict_takeover.py", "detect_strict_takeover", ["merged"], "strict"),
+    ("step7_plot_overview.py", "plot_overview", ["merged"], None),
+]
 
-    print("\n===== Running pipeline =====\n")
+# Tables written to output/dataset/ (skipped with --skip-intermediates)
+INTERMEDIATE_TABLES = {"cdst", "dcp", "merged"}
+
+
+def load_step(script):
+    """Import a step script from script/ as a module."""
+    return importlib.import_module(Path(script).stem)
 
+
+def run_subprocess():
     for step in SCRIPTS:
-        path = script_dir / step
+        path = SCRIPT_DIR / step
         print(f"[RUN] {step}")
 
         if not path.exists():
             print(f"[ERROR] Script not found: {path}")
-            return
+            return False
 
+        wall0, cpu0 = time.perf_counter(), profiling.children_cpu_s()
         result = subprocess.run(["python3", str(path)])
+        cpu = None if cpu0 is None else profiling.children_cpu_s() - cpu0
+        profiling.record(step, time.perf_counter() - wall0, cpu,
+                         peak_rss_mb=profiling.peak_rss_mb(children=True),
+                         status="ok" if result.returncode == 0 else "failed")
 
         if result.returncode != 0:
             print(f"[FAIL] {step} failed. Stopping.")
+            return False
+
+        print(f"[OK] {step} completed.\n")
+
+    return True
+
+
+def local_imports(script):
+    """The script and every script/ module it imports, directly or not (sorted paths)."""
+    found = set()
+    todo = [Path(script)]
+    while todo:
+        path = todo.pop()
+        if path in found:
+            continue
+        found.add(path)
+        # imports anywhere in the file, including those inside functions
+        for node in ast.walk(ast.parse(path.read_text(encoding="utf-8"))):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            todo += [SCRIPT_DIR / f"{name}.py" for name in names if (SCRIPT_DIR / f"{name}.py").exists()]
+    return sorted(found)
+
+
+def step_key(manifest, step, module, fingerprints, produced):
+    """
+    Hash of a step script, of the script/ modules it imports and of
+    everything it reads. Tables produced by an earlier step are
+    represented by their fingerprint; all other inputs (PDFs,
+    photo_list.csv) by file content.
+    """
+    h = hashlib.sha256()
+    for path in local_imports(SCRIPT_DIR / step):
+        h.update(f"{path.name}={manifest.hash_file(path)}\n".encode())
+    h.update(f"format={storage.FORMAT}\n".encode())
+
+    for path in expand(module.INPUTS):
+        if str(path) in produced:
+            digest = fingerprints.get(produced[str(path)])
+        else:
+            digest = manifest.hash_file(path)
+        h.update(f"{path}={digest}\n".encode())
+
+    return h.hexdigest()
+
+
+def matches(step, name):
+    """True if name designates the step (full stem or its stepN prefix)."""
+    stem = Path(step).stem
+    return name is not None and (stem == name or stem.startswith(f"{name}_"))
+
+
+def run_in_process(skip_intermediates=False, force=False, profile=None, parallel=False, jobs=None):
+    manifest = Manifest()
+    modules = {}
+
+    for step, _, _, _ in STEPS:
+        if not (SCRIPT_DIR / step).exists():
+            print(f"[ERROR] Script not found: {SCRIPT_DIR / step}")
+            return False
+        modules[step] = load_step(step)
+
+    # output file → table name, for every table produced by a step
+    produced = {
+        str(path): output
+        for step, _, _, output in STEPS if output is not None
+        for path in modules[step].OUTPUTS
+    }
+    deps = scheduler.dependencies(STEPS, modules)
+
+    tables = {}
+    loaders = {}
+    fingerprints = {}
+    keys = {}
+    outputs = {step: output for step, _, _, output in STEPS}
+    done = set()      # steps completed or skipped
+    active = []       # steps started and not completed yet
+    running = {}      # future → step (parallel mode)
+    timing = {}       # step → (start_s, end_s)
+    started = time.perf_counter()
+
+    if manifest.stopped and not force:
+        print(f"[INFO] Resuming the previous run, which stopped at {manifest.stopped}.\n")
+
+    def get_table(name):
+        if name not in tables:
+            with profiling.timed("load", item=name) as rec:
+                tables[name] = loaders[name]()
+                rec["rows_out"] = len(tables[name])
+        return tables[name]
+
+    def launch(step, func_name, inputs, output):
+        """Skip the step if it is cached, otherwise run it (in the pool if there is one)."""
+        module = modules[step]
+        key = keys[step] = step_key(manifest, step, module, fingerprints, produced)
+        entry = manifest.steps.get(step, {})
+
+        if (not force and not matches(step, profile)
+                and entry.get("key") == key and manifest.outputs_intact(step)):
+            print(f"[SKIP] {step} unchanged.\n")
+            profiling.record(step, 0.0, 0.0, status="skipped")
+            if output is not None:
+                fingerprints[output] = entry["fingerprint"]
+                loaders[output] = module.load
+            done.add(step)
             return
 
+        print(f"[RUN] {step}")
+        active.append(step)
+        args = [get_table(name) for name in inputs]
+        save = not (skip_intermediates and output in INTERMEDIATE_TABLES)
+        work = (scheduler.run_step, step, func_name, args, output, save, matches(step, profile), jobs)
+
+        if pool is None or matches(step, profile):
+            finish(step, work[0](*work[1:]))
+        else:
+            running[pool.submit(*work)] = step
+
+    def finish(step, out):
+        """Take over the result of a step and checkpoint it."""
+        output = outputs[step]
+        timing[step] = (out["start"] - started, out["end"] - started)
+        for rec in out["records"]:
+            if rec["name"] == step:
+                rec["start_s"], rec["end_s"] = (round(t, 4) for t in timing[step])
+        profiling.RECORDS.extend(out["records"])
+
+        written = [storage.path_for(p) for p in modules[step].OUTPUTS]
+        if output is None:
+            manifest.steps[step] = {"key": keys[step]}
+        else:
+            if out["result"] is None:
+                # e.g. no PDFs in temp/: fall back to the table on disk, as a script run does
+                if not storage.exists(modules[step].OUTPUTS[0]):
+                    raise RuntimeError(f"no {output} table produced")
+                print(f"[WARN] {step} produced no {output} table; using the existing "
+                      f"{storage.path_for(modules[step].OUTPUTS[0])}.")
+                out["result"] = modules[step].load()
+                out["fingerprint"] = frame_fingerprint(out["result"])
+                # only the files that are there (no station table without PDFs)
+                written = [p for p in written if p.exists()]
+            tables[output] = out["result"]
+            fingerprints[output] = out["fingerprint"]
+            manifest.steps[step] = {"key": keys[step], "fingerprint": out["fingerprint"]}
+            if skip_intermediates and output in INTERMEDIATE_TABLES:
+                # not on disk → cannot be reused next time
+                manifest.steps.pop(step)
+
+        # ---------- Checkpoint ----------
+        if step in manifest.steps:
+            manifest.record_outputs(step, written)
+        done.add(step)
+        active.remove(step)
+        manifest.stopped = next((s for s in outputs if s not in done), None)
+        manifest.save()
+
         print(f"[OK] {step} completed.\n")
 
+    pool = ProcessPoolExecutor(max_workers=jobs) if parallel else None
+    try:
+        while len(done) < len(STEPS):
+            ready = [entry for entry in STEPS
+                     if entry[0] not in done and entry[0] not in active and deps[entry[0]] <= done]
+            if not ready and not running:
+                raise RuntimeError(f"circular step dependencies: {sorted(set(outputs) - done)}")
+            for step, func_name, inputs, output in ready:
+                launch(step, func_name, inputs, output)
+
+            if running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    finish(step, future.result())
+    except KeyboardInterrupt:
+        # between two steps: the next one counts as interrupted
+        halted = active or [s for s in outputs if s not in done][:1]
+        print(f"\n[FAIL] {', '.join(halted)} interrupted.")
+        stop(manifest, halted)
+        raise
+    except Exception as exc:
+        # no step started (e.g. a dependency cycle): the next one counts as failed
+        halted = active or [s for s in outputs if s not in done][:1]
+        print(f"[FAIL] {', '.join(halted)} failed: {exc!r}. Stopping.")
+        stop(manifest, halted)
+        return False
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    scheduler.report(deps, timing, time.perf_counter() - started)
+
+    if manifest.stopped is not None:
+        # the remaining steps were unchanged
+        manifest.stopped = None
+        manifest.save()
+    return True
+
+
+def stop(manifest, steps):
+    """Record that the run stopped at steps (the completed steps are already saved)."""
+    # their outputs may be partly written → never reuse them
+    for step in steps:
+        manifest.steps.pop(step, None)
+    manifest.stopped = steps[0] if steps else None
+    manifest.save()
+    print(f"[INFO] Completed steps are saved; the next run resumes at {manifest.stopped}.")
+
+
+def run_append(jobs=None):
+    """
+    Append mode: recompute only the tail of the step2–step6 tables that
+    changed since the last run (see script/append.py). Falls back to a
+    full in-process run when there is no complete previous run.
+    """
+    steps = STEPS[:-1]   # the figure is not redrawn
+    modules = {step: load_step(step) for step, _, _, _ in steps}
+    manifest = Manifest()
+
+    if not all(manifest.outputs_intact(step) for step, _, _, _ in steps):
+        print("[INFO] No complete previous run → running the full pipeline.\n")
+        return run_in_process(jobs=jobs)
+
+    produced = {
+        str(path): output
+        for step, _, _, output in steps
+        for path in modules[step].OUTPUTS
+    }
+    old = {output: modules[step].load() for step, _, _, output in steps}
+    extras = {}   # table → keyword arguments of save() for the step's other outputs
+    fingerprints = {}
+
+    # ---------- step1 only if a PDF changed ----------
+    step1 = steps[0][0]
+    cdst = old["cdst"]
+    if manifest.steps[step1].get("key") != step_key(manifest, step1, modules[step1], fingerprints, produced):
+        print(f"[RUN] {step1}")
+        built = modules[step1].build(jobs=jobs)
+        if built is None:
+            print(f"[WARN] {step1} produced no cdst table; using the existing one.")
+        else:
+            cdst, extras["cdst"] = built
+
+    dcp = modules[steps[1][0]].build_dcp()
+    if "colony_id" in dcp.columns or modules[steps[2][0]].TOLERANCE is not None:
+        print("[INFO] Append mode needs one colony and exact-date merging → running the full pipeline.\n")
+        return run_in_process(jobs=jobs)
+
+    append = load_step("append.py")
+    with profiling.timed("append") as rec:
+        tables = append.update_tail(old, cdst, dcp)
+        rec["rows_out"] = None if tables is None else len(tables["merged"])
+
+    if tables is None:
+        print("[INFO] No new records; outputs are up to date.")
+        return True
+
+    print(f"[INFO] Recomputing from {tables['cut'].date()}")
+
+    for step, _, _, output in steps:
+        if output == "cdst" and cdst is old["cdst"]:
+            fingerprints[output] = manifest.steps[step]["fingerprint"]
+            continue
+        key = step_key(manifest, step, modules[step], fingerprints, produced)
+        fingerprints[output] = frame_fingerprint(tables[output])
+        modules[step].save(tables[output], **extras.get(output, {}))
+        manifest.steps[step] = {"key": key, "fingerprint": fingerprints[output]}
+        manifest.record_outputs(step, [storage.path_for(p) for p in modules[step].OUTPUTS])
+
+    manifest.save()
+    print("[INFO] Append mode draws no figure; run script/step7_plot_overview.py if needed.")
+    return True
+
+
+def run_batch(manifest_path, jobs=None):
+    batch = load_step("batch.py")
+    with profiling.timed("batch") as rec:
+        summary = batch.run_batch(manifest_path, jobs=jobs)
+        ok = summary is not None and bool((summary["status"] == "ok").all())
+        rec["status"] = "ok" if ok else "failed"
+        rec["rows_out"] = None if summary is None else len(summary)
+    return ok
+
+
+def run_streaming(chunksize=None, jobs=None):
+    streaming = load_step("streaming.py")
+    with profiling.timed("streaming") as rec:
+        ok = streaming.run_streaming(chunksize or streaming.CHUNKSIZE, jobs=jobs)
+        rec["status"] = "ok" if ok else "failed"
+    if ok:
+        print("[INFO] Streaming mode draws no figure; run script/step7_plot_overview.py if needed.")
+    return ok
+
+
+def interrupt(signum, frame):
+    raise KeyboardInterrupt(signal.Signals(signum).name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the IZU colony analysis pipeline.")
+    parser.add_argument(
+        "--subprocess",
+        action="store_true",
+        help="run each step script in its own python3 process (legacy mode)",
+    )
+    parser.add_argument(
+        "--skip-intermediates",
+        action="store_true",
+        help="do not write CDST.csv, DCP.csv and merged_dataset.csv (in-process mode only)",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="run step1–step6 in date-ordered chunks with bounded memory (see script/streaming.py)",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="rows of photo_list.csv per chunk in streaming mode",
+    )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="run independent steps at the same time in worker processes (in-process mode)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="re-run every step even if its inputs are unchanged",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(storage.FORMATS),
+        default=None,
+        help="storage format of the output tables (default: csv, or IZU_TABLE_FORMAT)",
+    )
+    parser.add_argument(
+        "--append",
+        action="store_true",
+        help="recompute only the tail of the outputs that changed since the last run",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="MANIFEST",
+        type=Path,
+        default=None,
+        help="run steps 2–7 for every colony of a colony manifest (see script/batch.py)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="worker processes for PDF parsing (all modes but --subprocess), batch mode and --parallel",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="STEP",
+        default=None,
+        help="run STEP (e.g. step1 or step1_extract_sst) under cProfile; dump in output/reports/",
+    )
+    args = parser.parse_args()
+
+    if args.format:
+        storage.set_format(args.format)
+
+    # pre-emption (SIGTERM) stops the run like Ctrl-C
+    signal.signal(signal.SIGTERM, interrupt)
+
+    print("\n===== Running pipeline =====\n")
+
+    try:
+        if args.subprocess:
+            mode = "subprocess"
+            ok = run_subprocess()
+        elif args.append:
+            mode = "append"
+            ok = run_append(jobs=args.jobs)
+        elif args.batch:
+            mode = "batch"
+            ok = run_batch(args.batch, jobs=args.jobs)
+        elif args.streaming:
+            mode = "streaming"
+            ok = run_streaming(args.chunksize, jobs=args.jobs)
+        else:
+            mode = "in-process"
+            ok = run_in_process(skip_intermediates=args.skip_intermediates, force=args.force,
+                                profile=args.profile, parallel=args.parallel, jobs=args.jobs)
+    except KeyboardInterrupt:
+        print("[FAIL] Pipeline interrupted. Run it again to resume.")
+        ok = False
+
+    profiling.write_report(mode=mode, ok=ok, format=storage.FORMAT)
+
+    if not ok:
+        return
+
     print("\n===== Pipeline completed successfully! =====\n")
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+append.py
+-----------------------------------------
+Append mode: update the step2–step6 tables after new daily records.
+
+The tables of the last run are read back and compared with the new
+CDST and DCP. Everything before the first date at which they differ
+(the cut) is kept; only the tail is recomputed:
+
+    DCP, merged  rows from the cut on
+    general      periods after the last o/p record before the cut
+    strict       periods with an onset after the last o/p day before the cut
+    onset        onsets after that day (their windows reach back before it)
+
+A period or onset before that o/p row cannot change: it ends at or
+before the o/p row, and every row it depends on is older than the cut.
+
+Limits: one colony (no colony_id column) and exact-date merging
+(step3 TOLERANCE = None); otherwise the tables are rebuilt in full.
+The figure (step7) is not redrawn.
+
+Usage:
+    python3 run_pipeline.py --append
+"""
+
+import numpy as np
+
+from lazy import lazy_import
+import step3_merge as step3
+import step4_detect_takeover as step4
+import step5_onset_temp_windows as step5
+import step6_detect_strict_takeover as step6
+
+pd = lazy_import("pandas")
+
+
+def with_dates(df, columns=("date",)):
+    """Copy of df with the given columns parsed as datetimes."""
+    return df.assign(**{c: pd.to_datetime(df[c]) for c in columns if c in df.columns})
+
+
+def first_change(old, new):
+    """First date at which two date-sorted tables differ, or None if they are equal."""
+    old = with_dates(old).reset_index(drop=True)
+    new = with_dates(new).reset_index(drop=True)
+
+    if list(old.columns) != list(new.columns):
+        return min(old["date"].min(), new["date"].min())
+
+    n = min(len(old), len(new))
+    same = np.ones(n, dtype=bool)
+    for col in new.columns:
+        a, b = old[col].iloc[:n], new[col].iloc[:n]
+        same &= ((a.to_numpy() == b.to_numpy()) | (a.isna() & b.isna()).to_numpy())
+
+    diff = np.flatnonzero(~same)
+    if len(diff):
+        i = diff[0]
+        return min(old["date"].iloc[i], new["date"].iloc[i])
+    if len(old) != len(new):
+        return (old if len(old) > len(new) else new)["date"].iloc[n]
+    return None
+
+
+def last_recovery(dates, phase, cut):
+    """Position of the last o/p row dated before the cut, or None."""
+    rows = np.flatnonzero((dates < np.datetime64(cut)) & np.isin(phase, (0, 1)))
+    return rows[-1] if len(rows) else None
+
+
+def keep_before(table, column, limit):
+    """Rows of an old period / onset table with column < limit."""
+    dates = pd.to_datetime(table[column])
+    kept = table[dates < limit].copy()
+    for col in kept.columns:
+        if col.endswith("_date"):
+            kept[col] = pd.to_datetime(kept[col]).dt.date
+    return kept
+
+
+def update_tail(old, cdst, dcp):
+    """
+    Recompute the tail of the merged, general, onset and strict tables.
+    old: the tables of the last run ("cdst", "dcp", "merged", "general",
+    "onset", "strict"). Returns the updated tables (with "cut"), or None
+    if CDST and DCP are unchanged.
+    """
+    changes = [first_change(old["dcp"], dcp)]
+    if cdst is not old["cdst"]:
+        changes.append(first_change(old["cdst"], cdst))
+
+    cdst = with_dates(cdst)
+    dcp = with_dates(dcp)
+    changes = [c for c in changes if c is not None]
+    if not changes:
+        return None
+    cut = min(changes)
+
+    # ---------- merged ----------
+    merged_old = with_dates(old["merged"])
+    tail = step3.merge_datasets(cdst[cdst["date"] >= cut], dcp[dcp["date"] >= cut])
+    merged = pd.concat([merged_old[merged_old["date"] < cut], tail], ignore_index=True)
+
+    # ---------- general periods (DCP rows) ----------
+    dcp_dates = dcp["date"].to_numpy()
+    c = last_recovery(dcp_dates, dcp["phase_num"].to_numpy(dtype=float), cut)
+    if c is None:
+        general = step4.detect_general_takeover(dcp)
+    else:
+        general = pd.concat([
+            keep_before(old["general"], "start_date", dcp_dates[c]),
+            step4.detect_general_takeover(dcp.iloc[c:]),
+        ], ignore_index=True)
+
+    # ---------- strict periods and onset windows (merged rows) ----------
+    dates = merged["date"].to_numpy()
+    c = last_recovery(dates, pd.to_numeric(merged["phase_num"], errors="coerce").to_numpy(dtype=float), cut)
+    if c is None:
+        strict = step6.detect_strict_takeover(merged)
+        onset = step5.onset_temperature_windows(merged)
+    else:
+        strict = pd.concat([
+            keep_before(old["strict"], "onset_date", dates[c]),
+            step6.detect_strict_takeover(merged.iloc[c:]),
+        ], ignore_index=True)
+
+        # windows of the new onsets reach back max(WINDOWS) rows / days
+        start = max(0, c - max(step5.WINDOWS))
+        new_onsets = step5.onset_temperature_windows(merged.iloc[start:])
+        new_onsets = new_onsets[pd.to_datetime(new_onsets["onset_date"]) >= dates[c]]
+        onset = pd.concat([keep_before(old["onset"], "onset_date", dates[c]), new_onsets],
+                          ignore_index=True)
+
+    return {"cut": cut, "cdst": cdst, "dcp": dcp, "merged": merged,
+            "general": general, "onset": onset, "strict": strict}
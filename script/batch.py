@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+batch.py
+-----------------------------------------
+Batch mode: many colonies sharing the same SST PDFs.
+
+Colony manifest (CSV, one row per colony):
+    colony_id    name of the colony
+    photo_list   its photo_list.csv
+    station      SST station (optional, default 波浮口)
+    output_root  its output directory (optional, default output/colonies/<colony_id>)
+
+The SST PDFs in temp/ are parsed once (step1, all stations). Steps 2–7
+then run for every colony in a process pool, one colony per task.
+
+Output:
+    <output_root>/dataset/        CDST, DCP and merged tables of the colony
+    <output_root>/takeover_phase/ periods, onset windows and overview figure
+    <output_root>/batch.log       messages of the colony's steps
+    output/batch_summary.csv      one row per colony (written at the end)
+
+A colony that fails is reported in the summary; the others still run.
+
+Usage:
+    python3 run_pipeline.py --batch colonies.csv [--jobs N]
+    python3 script/batch.py colonies.csv [--jobs N]
+"""
+
+import argparse
+import contextlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from lazy import lazy_import
+import step1_extract_sst as step1
+import step2_build_dcp as step2
+import step3_merge as step3
+import step4_detect_takeover as step4
+import step5_onset_temp_windows as step5
+import step6_detect_strict_takeover as step6
+import step7_plot_overview as step7
+from storage import write_table
+
+pd = lazy_import("pandas")
+
+COLONY_ROOT = Path("output/colonies")
+SUMMARY = Path("output/batch_summary.csv")
+MANIFEST_COLUMNS = ["colony_id", "photo_list", "station", "output_root"]
+
+
+def read_colonies(path):
+    """Colony manifest with defaults filled in."""
+    colonies = pd.read_csv(path, dtype=str)
+    missing = [c for c in ("colony_id", "photo_list") if c not in colonies.columns]
+    if missing:
+        raise ValueError(f"{path} must contain columns: {', '.join(missing)}")
+    if colonies["colony_id"].duplicated().any():
+        raise ValueError(f"{path}: colony_id values must be unique")
+
+    colonies = colonies.reindex(columns=MANIFEST_COLUMNS)
+    colonies["station"] = colonies["station"].fillna(step1.TARGET_STATION_JP)
+    colonies["output_root"] = colonies["output_root"].fillna(
+        colonies["colony_id"].map(lambda c: str(COLONY_ROOT / c))
+    )
+    return colonies
+
+
+def colony_summary(colony, merged, general, onset, strict):
+    """Summary row of one colony."""
+    observed = merged["phase_num"].dropna()
+    return {
+        "colony_id": colony["colony_id"],
+        "station": colony["station"],
+        "days": len(merged),
+        "observed_days": len(observed),
+        "takeover_fraction": (observed == 2).mean() if len(observed) else None,
+        "general_periods": len(general),
+        "mean_general_duration": general["duration_general"].mean() if len(general) else None,
+        "strict_periods": len(strict),
+        "mean_strict_duration": strict["duration_strict"].mean() if len(strict) else None,
+        "onsets": len(onset),
+    }
+
+
+def run_colony(task):
+    """Worker: steps 2–7 of one colony. Returns its summary row."""
+    colony, sst = task
+    root = Path(colony["output_root"])
+    dataset, takeover = root / "dataset", root / "takeover_phase"
+    dataset.mkdir(parents=True, exist_ok=True)
+    takeover.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    row = {"colony_id": colony["colony_id"], "station": colony["station"]}
+
+    with open(root / "batch.log", "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        try:
+            dcp = step2.build_dcp(Path(colony["photo_list"]))
+            merged = step3.merge_datasets(sst, dcp)
+            general = step4.detect_general_takeover(dcp)
+            onset = step5.onset_temperature_windows(merged)
+            strict = step6.detect_strict_takeover(merged)
+
+            step1.save(sst, dataset / step1.OUTFILE.name)
+            step2.save(dcp, dataset / step2.OUTFILE.name)
+            step3.save(merged, dataset / step3.OUTFILE.name)
+            step4.save(general, takeover / step4.OUTFILE.name)
+            step5.save(onset, takeover / step5.OUTFILE.name)
+            step6.save(strict, takeover / step6.OUTFILE.name)
+            step7.plot_overview(merged, takeover)
+
+            row = colony_summary(colony, merged, general, onset, strict)
+            row["status"] = "ok"
+        except Exception as exc:
+            print(f"[ERROR] {exc!r}")
+            row["status"] = f"failed: {exc!r}"
+
+    row["seconds"] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def run_batch(manifest_path, jobs=None, summary_path=SUMMARY):
+    """Parse the SST once, then run steps 2–7 of every colony in parallel."""
+    colonies = read_colonies(manifest_path)
+    print(f"[INFO] Batch of {len(colonies)} colonies from {manifest_path}")
+
+    wide = step1.build_stations(jobs=jobs)
+    if wide is None:
+        print("[ERROR] No SST records extracted.")
+        return None
+    step1.save_stations(wide)
+
+    tasks = []
+    rows = []
+    for colony in colonies.to_dict("records"):
+        if colony["station"] not in wide.columns:
+            print(f"[FAIL] {colony['colony_id']}: station not found in SST data: {colony['station']}")
+            rows.append({"colony_id": colony["colony_id"], "station": colony["station"],
+                         "status": "failed: unknown station"})
+            continue
+        tasks.append((colony, step1.select_station(wide, colony["station"])))
+
+    start = time.perf_counter()
+    if len(tasks) > 1 and (jobs is None or jobs > 1):
+        with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+            results = pool.map(run_colony, tasks)
+            for row in results:
+                print(f"[{'OK' if row['status'] == 'ok' else 'FAIL'}] {row['colony_id']} ({row['seconds']} s)")
+                rows.append(row)
+    else:
+        for task in tasks:
+            row = run_colony(task)
+            print(f"[{'OK' if row['status'] == 'ok' else 'FAIL'}] {row['colony_id']} ({row['seconds']} s)")
+            rows.append(row)
+
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] {len(tasks)} colonies in {elapsed:.1f} s")
+
+    order = {c: i for i, c in enumerate(colonies["colony_id"])}
+    summary = pd.DataFrame(rows).sort_values("colony_id", key=lambda s: s.map(order)).reset_index(drop=True)
+    summary = summary.convert_dtypes()  # integer counts stay integers next to failed rows
+    summary_path = write_table(summary, summary_path)
+    print(f"[INFO] Batch summary → {summary_path}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run steps 2–7 for many colonies sharing the SST PDFs.")
+    parser.add_argument("manifest", type=Path, help="colony manifest (CSV)")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes")
+    args = parser.parse_args()
+
+    run_batch(args.manifest, jobs=args.jobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+lazy.py
+-----------------------------------------
+Deferred imports of heavy libraries.
+
+    pd = lazy_import("pandas")
+
+binds pd to a module object that is only loaded when one of its
+attributes is first used. Importing a step module (run_pipeline.py
+reads INPUTS / OUTPUTS of every step, --help, cache hits) therefore
+does not pay for pandas. matplotlib, pdfplumber, pypdfium2, pyarrow
+and PIL are imported inside the functions that need them.
+"""
+
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """Module `name`, loaded on first attribute access (at once if already imported)."""
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}")
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+loggers.py
+-----------------------------------------
+In-situ temperature loggers: a second SST source of step1.
+
+Files in loggers/ (one logger per file; the files of one logger are combined):
+    <station>_<any>.csv   text export with a header row; columns
+                          TIME_COLUMN (TIME_FORMAT, local time) and
+                          TEMP_COLUMN (°C); other columns are ignored
+    <station>_<any>.bin   raw little-endian records (RECORD):
+                          int64 seconds since 1970-01-01 (local time),
+                          float32 °C
+The station name is the part of the file name before the first "_".
+
+Reading:
+    CSV files are read in blocks of CHUNK_ROWS rows (pandas C parser,
+    one vectorised timestamp conversion per block); binary files are
+    memory-mapped and sliced into blocks of the same size. Nothing is
+    parsed line by line.
+
+Daily reduction:
+    Each block is reduced to daily partials (sum, count, min, max) with
+    np.*.reduceat over its timestamps (sorted first only if needed); no
+    groupby. Partials of the same day from different blocks or files
+    are combined the same way, so the result does not depend on the
+    block size.
+
+Daily table of each station:
+    date, sst (mean), sst_min, sst_max, sst_range, samples
+    Days with fewer than MIN_SAMPLES records (deployment and retrieval
+    days) are NaN.
+
+Cache:
+    The daily partials of every file are kept in output/cache/logger/
+    as <file name>-<content hash>-v<PARSER_VERSION>.npz; bump PARSER_VERSION
+    when the parsing rules or the column settings change.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from lazy import lazy_import
+from manifest import file_sha256
+from profiling import record, timed_call
+from storage import atomic_write
+
+pd = lazy_import("pandas")
+
+LOGGER_DIR = Path("loggers")
+PATTERNS = ("*.csv", "*.bin")
+CACHE_DIR = Path("output/cache/logger")
+
+PARSER_VERSION = 1
+
+# CSV columns and timestamp format
+TIME_COLUMN = "timestamp"
+TEMP_COLUMN = "temperature"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Binary record layout
+RECORD = np.dtype([("time", "<i8"), ("temp", "<f4")])
+
+# Rows per block
+CHUNK_ROWS = 1_000_000
+
+# Minimum records per day (10-minute logger: 144 per full day)
+MIN_SAMPLES = 72
+
+NS_PER_DAY = 86_400 * 10**9
+SECONDS_PER_DAY = 86_400
+
+
+def logger_files(logger_dir=LOGGER_DIR):
+    return sorted(p for pattern in PATTERNS for p in Path(logger_dir).glob(pattern))
+
+
+def station_of(path):
+    """Station name of a logger file: its name up to the first "_"."""
+    return Path(path).stem.split("_")[0]
+
+
+def read_blocks(path, chunk_rows=CHUNK_ROWS):
+    """Yield (day number since 1970-01-01, temperature) arrays block by block."""
+    path = Path(path)
+
+    if path.suffix == ".bin":
+        if path.stat().st_size == 0:
+            return
+        records = np.memmap(path, dtype=RECORD, mode="r")
+        for start in range(0, len(records), chunk_rows):
+            block = records[start:start + chunk_rows]
+            yield block["time"] // SECONDS_PER_DAY, block["temp"].astype(np.float64)
+        return
+
+    reader = pd.read_csv(path, usecols=[TIME_COLUMN, TEMP_COLUMN], dtype={TIME_COLUMN: str},
+                         chunksize=chunk_rows, encoding="utf-8-sig")
+    for chunk in reader:
+        time = pd.to_datetime(chunk[TIME_COLUMN], format=TIME_FORMAT, errors="coerce")
+        temp = pd.to_numeric(chunk[TEMP_COLUMN], errors="coerce").to_numpy(dtype=np.float64)
+        temp = np.where(time.isna().to_numpy(), np.nan, temp)
+        ns = time.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        yield ns // NS_PER_DAY, temp
+
+
+def reduce_daily(day, total, count, low, high):
+    """
+    Combine records (or partials) of the same day.
+    Inputs are equal-length arrays; rows need not be sorted.
+    Returns (day, total, count, min, max) with one row per day.
+    """
+    if len(day) == 0:
+        return day, total, count, low, high
+
+    if np.any(day[1:] < day[:-1]):
+        order = np.argsort(day, kind="stable")
+        day, total, count, low, high = day[order], total[order], count[order], low[order], high[order]
+
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    return (
+        day[starts],
+        np.add.reduceat(total, starts),
+        np.add.reduceat(count, starts),
+        np.minimum.reduceat(low, starts),
+        np.maximum.reduceat(high, starts),
+    )
+
+
+def block_partials(day, temp):
+    """Daily partials of one block of records (missing values skipped)."""
+    ok = ~np.isnan(temp)
+    day, temp = day[ok], temp[ok]
+    return reduce_daily(day, temp, np.ones(len(temp), dtype=np.int64), temp, temp)
+
+
+def combine(partials):
+    """Combine lists of daily partials into one."""
+    if not partials:
+        empty = np.array([], dtype=np.float64)
+        return np.array([], dtype=np.int64), empty, np.array([], dtype=np.int64), empty, empty
+    return reduce_daily(*(np.concatenate(column) for column in zip(*partials)))
+
+
+def parse_logger(path, chunk_rows=CHUNK_ROWS):
+    """Daily partials of one logger file."""
+    return combine([block_partials(day, temp) for day, temp in read_blocks(path, chunk_rows)])
+
+
+def cache_path(path, digest):
+    return CACHE_DIR / f"{Path(path).name}-{digest[:16]}-v{PARSER_VERSION}.npz"
+
+
+def read_cache(path):
+    with np.load(path) as data:
+        return tuple(data[k] for k in ("day", "total", "count", "low", "high"))
+
+
+def write_cache(path, partials, name):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Drop entries of older versions of the same file
+    for old in CACHE_DIR.glob(f"{name}-*.npz"):
+        if old != path:
+            old.unlink()
+
+    with atomic_write(path) as tmp:
+        np.savez(tmp, **dict(zip(("day", "total", "count", "low", "high"), partials)))
+
+
+def file_partials(paths, jobs=None):
+    """Daily partials of every file (cache misses are parsed in a process pool)."""
+    keyed = [(p, cache_path(p, file_sha256(p))) for p in paths]
+    misses = [(p, cached) for p, cached in keyed if not cached.exists()]
+    print(f"[INFO] {len(keyed) - len(misses)} logger files from cache, {len(misses)} to parse")
+
+    parsed = {}
+    work = partial(timed_call, parse_logger)
+    if len(misses) > 1 and (jobs is None or jobs > 1):
+        with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+            results = list(pool.map(work, [p for p, _ in misses]))
+    else:
+        results = [work(p) for p, _ in misses]
+
+    for (p, cached), (partials, wall, cpu) in zip(misses, results):
+        record("parse_logger", wall, cpu, item=p.name, rows_out=len(partials[0]))
+        write_cache(cached, partials, p.name)
+        parsed[p] = partials
+
+    return [(p, parsed[p] if p in parsed else read_cache(cached)) for p, cached in keyed]
+
+
+def daily_table(partials, min_samples=MIN_SAMPLES):
+    """
+    Daily table (date, sst, sst_min, sst_max, sst_range, samples) of one
+    station, on a gap-free daily axis (days without records are NaN).
+    """
+    day, total, count, low, high = partials
+
+    # spread the days onto a continuous range
+    first = day.min() if len(day) else 0
+    n = int(day.max() - first + 1) if len(day) else 0
+    at = day - first
+    day = np.arange(first, first + n)
+    total, low, high = (np.full(n, np.nan) for _ in range(3))
+    total[at], low[at], high[at] = partials[1], partials[3], partials[4]
+    count = np.zeros(n, dtype=np.int64)
+    count[at] = partials[2]
+    enough = count >= min_samples
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(enough, total / count, np.nan)
+    low = np.where(enough, low, np.nan)
+    high = np.where(enough, high, np.nan)
+
+    return pd.DataFrame({
+        "date": pd.to_datetime(day.astype("datetime64[D]")),
+        "sst": mean,
+        "sst_min": low,
+        "sst_max": high,
+        "sst_range": high - low,
+        "samples": count,
+    })
+
+
+def build_logger_stations(paths=None, jobs=None):
+    """{station: daily table} of every logger in loggers/ (empty if there are none)."""
+    if paths is None:
+        paths = logger_files()
+    if not paths:
+        return {}
+
+    by_station = {}
+    for path, partials in file_partials(paths, jobs=jobs):
+        by_station.setdefault(station_of(path), []).append(partials)
+
+    stations = {name: daily_table(combine(parts)) for name, parts in by_station.items()}
+    for name, daily in stations.items():
+        print(f"[INFO] Logger {name}: {len(daily)} days, {int(daily['samples'].sum())} records")
+    return stations
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+manifest.py
+-----------------------------------------
+Content hashes for the incremental pipeline.
+
+The manifest (output/manifest.json) records, for every step:
+    key          : hash of the step script, of the script/ modules it
+                   imports and of all its declared inputs
+    fingerprint  : hash of the table the step produced
+    outputs      : hash of every output file written by the step
+
+A step whose key is unchanged and whose output files are still intact
+does not need to run again. "stopped" names the step an unfinished run
+stopped at (null after a complete run).
+
+File hashes are memoised by (size, mtime) so that unchanged inputs such
+as years of monthly PDFs are not re-read on every run.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from storage import atomic_write
+
+MANIFEST = Path("output/manifest.json")
+
+CHUNK = 1 << 20
+
+
+def file_sha256(path):
+    """SHA-256 of a file's content."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def frame_fingerprint(df):
+    """SHA-256 of a DataFrame as it would be written to CSV."""
+    return hashlib.sha256(df.to_csv(index=False).encode("utf-8")).hexdigest()
+
+
+def expand(paths):
+    """Expand declared inputs: entries containing '*' are glob patterns."""
+    files = []
+    for p in paths:
+        p = Path(p)
+        if "*" in p.name:
+            files.extend(sorted(p.parent.glob(p.name)))
+        else:
+            files.append(p)
+    return files
+
+
+class Manifest:
+    def __init__(self, path=MANIFEST):
+        self.path = Path(path)
+        self.steps = {}
+        self.files = {}
+        self.stopped = None
+        self._saved = None
+
+        if self.path.exists():
+            try:
+                self._saved = self.path.read_text(encoding="utf-8")
+                data = json.loads(self._saved)
+                self.steps = data.get("steps", {})
+                self.files = data.get("files", {})
+                self.stopped = data.get("stopped")
+            except (OSError, ValueError):
+                print(f"[WARN] Ignoring unreadable manifest: {self.path}")
+
+    def hash_file(self, path):
+        """Content hash of a file, or None if it does not exist."""
+        path = Path(path)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+
+        stamp = [st.st_size, st.st_mtime_ns]
+        memo = self.files.get(str(path))
+        if memo is not None and memo[:2] == stamp:
+            return memo[2]
+
+        digest = file_sha256(path)
+        self.files[str(path)] = stamp + [digest]
+        return digest
+
+    def outputs_intact(self, step):
+        """True if every recorded output of the step is unchanged on disk."""
+        entry = self.steps.get(step)
+        if not entry:
+            return False
+        return all(
+            digest is not None and self.hash_file(path) == digest
+            for path, digest in entry.get("outputs", {}).items()
+        )
+
+    def record_outputs(self, step, paths):
+        entry = self.steps.setdefault(step, {})
+        entry["outputs"] = {str(p): self.hash_file(p) for p in paths}
+
+    def save(self):
+        text = json.dumps({"steps": self.steps, "files": self.files, "stopped": self.stopped},
+                          indent=1, sort_keys=True)
+        if text == self._saved:
+            return   # unchanged (e.g. a run where every step was skipped)
+        with atomic_write(self.path) as tmp:
+            tmp.write_text(text, encoding="utf-8")
+        self._saved = text
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+plot_facets.py
+-----------------------------------------
+Phase × SST overview figures per colony and per season, plus a summary.
+
+Facets (--by):
+    colony_id  one figure per colony (used if the merged table has it)
+    season     one figure per season; a season starts in --season-start
+               (1 → calendar years "2024", 4 → "2024-25")
+
+Input:
+    output/dataset/merged_dataset.csv
+
+Output:
+    output/figures/overview_<facet>.png
+    output/figures/summary_takeover_fraction.png
+        share of observed days in takeover, colony × season
+    output/figures/facets.json
+        hash of the data slice and plotting code of every figure
+
+Figures are rendered in a process pool. A figure whose hash is
+unchanged and whose files exist is not drawn again.
+
+Usage:
+    python3 script/plot_facets.py [--by colony_id season] [--jobs N] [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from lazy import lazy_import
+from manifest import file_sha256, frame_fingerprint
+from storage import atomic_write, exists, read_table
+from step7_plot_overview import MERGED, overview_figure, pyplot, save_figure
+
+pd = lazy_import("pandas")
+
+FIGURE_DIR = Path("output/figures")
+FACET_INDEX = FIGURE_DIR / "facets.json"
+SUMMARY_NAME = "summary_takeover_fraction"
+
+FACETS = ("colony_id", "season")
+SEASON_START_MONTH = 1
+FORMATS = (".png",)
+
+
+def season_of(dates, start_month=SEASON_START_MONTH):
+    """Season label of each date ("2024", or "2024-25" if start_month > 1)."""
+    dates = pd.to_datetime(dates)
+    year = dates.dt.year - (dates.dt.month < start_month)
+    if start_month == 1:
+        return year.astype(str)
+    return year.astype(str) + "-" + ((year + 1) % 100).map("{:02d}".format)
+
+
+def code_hash():
+    """Hash of the plotting code, so that figures are redrawn when it changes."""
+    here = Path(__file__).resolve().parent
+    return "".join(file_sha256(here / name)[:16] for name in ("step7_plot_overview.py", "plot_facets.py"))
+
+
+def facet_name(keys, values):
+    label = "_".join(str(v) for v in values) if keys else "all"
+    return re.sub(r"[^\w.-]+", "-", label)
+
+
+def render_facet(task):
+    """Worker: draw and save one facet figure."""
+    df, paths, title = task
+    save_figure(overview_figure(df, title=title), paths)
+    return paths
+
+
+def render_summary(table, paths):
+    """Heatmap of the takeover fraction, colony × season."""
+    fig, ax = pyplot().subplots(figsize=(max(4, 0.8 * table.shape[1] + 2), max(2, 0.5 * table.shape[0] + 1.5)))
+    im = ax.imshow(table.to_numpy(dtype=float), cmap="Reds", vmin=0, vmax=1, aspect="auto")
+
+    ax.set_xticks(range(table.shape[1]))
+    ax.set_xticklabels(table.columns, rotation=45, ha="right")
+    ax.set_yticks(range(table.shape[0]))
+    ax.set_yticklabels(table.index)
+    ax.set_xlabel("Season")
+    ax.set_ylabel("Colony")
+
+    for (r, c), v in np.ndenumerate(table.to_numpy(dtype=float)):
+        if not np.isnan(v):
+            ax.text(c, r, f"{v:.2f}", ha="center", va="center", fontsize=7)
+
+    fig.colorbar(im, ax=ax, label="Share of observed days in takeover")
+    fig.tight_layout()
+    save_figure(fig, paths)
+
+
+def takeover_fraction(df, keys):
+    """Share of days with a phase that are takeover (2), colony × season."""
+    observed = df.dropna(subset=["phase_num"])
+    every = pd.Series("all", index=observed.index)
+
+    colony = observed["colony_id"] if "colony_id" in keys else every
+    season = observed["season"] if "season" in keys else every
+
+    is_t = observed["phase_num"] == 2
+    return is_t.groupby([colony.rename("colony"), season.rename("season")]).mean().unstack("season")
+
+
+def plot_facets(merged, by=FACETS, outdir=FIGURE_DIR, jobs=None,
+                season_start_month=SEASON_START_MONTH, force=False):
+    """
+    Render one overview figure per facet and a summary figure.
+    Returns the number of figures drawn (skipped ones excluded).
+    """
+    df = merged.assign(date=pd.to_datetime(merged["date"]))
+    if "season" in by:
+        df["season"] = season_of(df["date"], season_start_month)
+
+    keys = [k for k in by if k in df.columns]
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    index_path = outdir / FACET_INDEX.name
+    index = json.loads(index_path.read_text(encoding="utf-8")) if index_path.exists() else {}
+    code = code_hash()
+
+    tasks = []
+    hashes = {}
+    groups = df.groupby(keys, sort=True) if keys else [((), df)]
+
+    for values, part in groups:
+        values = values if isinstance(values, tuple) else (values,)
+        name = f"overview_{facet_name(keys, values)}"
+        part = part.sort_values("date").reset_index(drop=True)
+
+        digest = hashlib.sha256((code + frame_fingerprint(part)).encode()).hexdigest()
+        paths = [outdir / f"{name}{ext}" for ext in FORMATS]
+        hashes[name] = digest
+
+        if not force and index.get(name) == digest and all(p.exists() for p in paths):
+            continue
+
+        title = ", ".join(f"{k} {v}" for k, v in zip(keys, values))
+        tasks.append((part, paths, title))
+
+    print(f"[INFO] {len(hashes)} facets, {len(tasks)} to draw")
+
+    if len(tasks) > 1 and (jobs is None or jobs > 1):
+        with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+            list(pool.map(render_facet, tasks))
+    else:
+        for task in tasks:
+            render_facet(task)
+
+    # ---------- Summary ----------
+    summary = takeover_fraction(df, keys)
+    digest = hashlib.sha256((code + frame_fingerprint(summary.reset_index())).encode()).hexdigest()
+    paths = [outdir / f"{SUMMARY_NAME}{ext}" for ext in FORMATS]
+    hashes[SUMMARY_NAME] = digest
+    drawn = len(tasks)
+
+    if force or index.get(SUMMARY_NAME) != digest or not all(p.exists() for p in paths):
+        render_summary(summary, paths)
+        drawn += 1
+
+    with atomic_write(index_path) as tmp:
+        tmp.write_text(json.dumps(hashes, indent=1, sort_keys=True), encoding="utf-8")
+    return drawn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Draw per-colony / per-season overview figures.")
+    parser.add_argument("--by", nargs="*", default=list(FACETS),
+                        help="facet keys (colony_id, season); none = one figure")
+    parser.add_argument("--season-start", type=int, default=SEASON_START_MONTH,
+                        help="first month of a season (default: 1 = calendar year)")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes")
+    parser.add_argument("--force", action="store_true", help="redraw every figure")
+    args = parser.parse_args()
+
+    print("[INFO] Plotting faceted phase × temperature overviews")
+
+    if not exists(MERGED):
+        raise FileNotFoundError("merged dataset not found. Run step3 first.")
+
+    drawn = plot_facets(read_table(MERGED, ["date", "sst", "phase_num", "colony_id"]), by=args.by, jobs=args.jobs,
+                        season_start_month=args.season_start, force=args.force)
+    print(f"[INFO] Drew {drawn} figures → {FIGURE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
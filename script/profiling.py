@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+profiling.py
+-----------------------------------------
+Timing records for the pipeline and a run report.
+
+Every step and some internal phases are recorded with:
+    name         step script or phase (parse_pdf, exif_read, figure_save, ...)
+    item         PDF / image / figure the record belongs to (if any)
+    wall_s       elapsed time
+    cpu_s        CPU time (of the thread / worker that did the work)
+    peak_rss_mb  peak resident memory of this process so far
+    rows_in      rows of the input tables (steps)
+    rows_out     rows of the output table (steps)
+    start_s      start of a step, seconds since the start of the run
+    end_s        end of a step (start_s / end_s: in-process steps only)
+
+Work done in worker processes or threads is timed there (timed_call)
+and recorded here by the caller.
+
+Report:
+    output/reports/<name>.json   run metadata + all records
+    output/reports/<name>.csv    the records as a table
+
+Profile of one step (run_pipeline.py --profile STEP):
+    output/reports/<step>.prof      cProfile data (snakeviz, pstats, ...)
+    output/reports/<step>.prof.txt  top functions by cumulative time
+"""
+
+import cProfile
+import csv
+import io
+import json
+import platform
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from storage import atomic_write
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORT_DIR = Path("output/reports")
+COLUMNS = ["name", "item", "wall_s", "cpu_s", "peak_rss_mb", "rows_in", "rows_out", "status",
+           "start_s", "end_s"]
+PROFILE_LINES = 30
+
+RECORDS = []
+
+
+def peak_rss_mb(children=False):
+    """Peak resident memory (MiB) of this process, or of its finished children."""
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def children_cpu_s():
+    """CPU time used by finished child processes so far."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def record(name, wall_s, cpu_s=None, **info):
+    """Add a record measured elsewhere (e.g. in a worker)."""
+    rec = {"name": name, **info}
+    rec["wall_s"] = round(wall_s, 4)
+    rec["cpu_s"] = None if cpu_s is None else round(cpu_s, 4)
+    rec.setdefault("peak_rss_mb", peak_rss_mb())
+    RECORDS.append(rec)
+    return rec
+
+
+@contextmanager
+def timed(name, **info):
+    """
+    Time the enclosed block. Yields the record, so the caller can add
+    fields (e.g. rows_out) before it is stored.
+    """
+    rec = dict(info)
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    try:
+        yield rec
+    finally:
+        record(name, time.perf_counter() - wall0, time.process_time() - cpu0, **rec)
+
+
+def timed_call(func, *args):
+    """Call func(*args) in a worker; returns (result, wall_s, cpu_s)."""
+    wall0, cpu0 = time.perf_counter(), time.thread_time()
+    result = func(*args)
+    return result, time.perf_counter() - wall0, time.thread_time() - cpu0
+
+
+def profile_call(func, args, name, outdir=REPORT_DIR):
+    """Run func(*args) under cProfile and write <name>.prof and <name>.prof.txt."""
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        prof = outdir / f"{name}.prof"
+        profiler.dump_stats(prof)
+
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        prof.with_name(prof.name + ".txt").write_text(text.getvalue(), encoding="utf-8")
+        print(f"[INFO] Profile of {name} → {prof}")
+
+
+def write_report(name="run_report", outdir=REPORT_DIR, **meta):
+    """Write the records as JSON (with run metadata) and CSV."""
+    outdir = Path(outdir)
+    meta = {
+        "finished": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_children_mb": peak_rss_mb(children=True),
+        **meta,
+    }
+
+    json_path = outdir / f"{name}.json"
+    with atomic_write(json_path) as tmp:
+        tmp.write_text(json.dumps({"run": meta, "records": RECORDS}, indent=1, ensure_ascii=False),
+                       encoding="utf-8")
+
+    with atomic_write(outdir / f"{name}.csv") as tmp, open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(RECORDS)
+
+    print(f"[INFO] Run report → {json_path}")
+    return json_path
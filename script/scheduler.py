@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+scheduler.py
+-----------------------------------------
+Dependency graph of the in-process pipeline and its critical path.
+
+The graph follows from the declarations in run_pipeline.STEPS and the
+INPUTS / OUTPUTS of each step script: a step depends on the steps that
+produce its input tables or write one of its declared input files.
+
+    step1 ─┐
+           ├─ step3 ─┬─ step5
+    step2 ─┤         ├─ step6
+           │         └─ step7
+           └─ step4
+
+run_pipeline.py starts every step as soon as the steps it depends on
+are done. With --parallel, steps run in a process pool (--jobs workers,
+default: one per core) and each worker saves the outputs of its step;
+otherwise they run one after another in STEPS order. The main process
+decides which steps are cached, passes the tables and keeps the manifest.
+
+Critical path:
+    The chain of dependent steps with the largest total time — the
+    shortest possible wall time of a parallel run. It is printed after
+    every in-process run and added to the run report (record
+    "critical_path"; step records get start_s / end_s, seconds since
+    the start of the run).
+"""
+
+import importlib
+import inspect
+import time
+from functools import partial
+from pathlib import Path
+
+from manifest import expand, frame_fingerprint
+import profiling
+
+
+def dependencies(steps, modules):
+    """{step: set of the steps it depends on}."""
+    producer = {output: step for step, _, _, output in steps if output is not None}
+    writer = {str(path): step for step, _, _, _ in steps for path in modules[step].OUTPUTS}
+
+    deps = {}
+    for step, _, inputs, _ in steps:
+        need = {producer[name] for name in inputs}
+        need |= {writer[str(p)] for p in expand(modules[step].INPUTS) if str(p) in writer}
+        need.discard(step)
+        deps[step] = need
+    return deps
+
+
+def run_step(step, func_name, args, output=None, save=True, profile=False, jobs=None):
+    """
+    Run one step (in a worker process or in the caller) and save its
+    outputs. jobs goes to step functions that take it (PDF parsing).
+    Returns a dict with the result, its fingerprint, the start and end
+    time (perf_counter) and the profiling records made meanwhile.
+    """
+    module = importlib.import_module(Path(step).stem)
+    func = getattr(module, func_name)
+    if jobs is not None and "jobs" in inspect.signature(func).parameters:
+        func = partial(func, jobs=jobs)
+    mark = len(profiling.RECORDS)
+    start = time.perf_counter()
+
+    extra = {}
+    with profiling.timed(step, rows_in=sum(len(t) for t in args), status="failed") as rec:
+        if profile:
+            result = profiling.profile_call(func, args, Path(step).stem)
+        else:
+            result = func(*args)
+        if isinstance(result, tuple):
+            # (table, keyword arguments of save() for the step's other outputs)
+            result, extra = result
+        rec["status"] = "ok"
+        rec["rows_out"] = None if result is None else len(result)
+
+    fingerprint = None
+    if result is not None:
+        fingerprint = frame_fingerprint(result)
+        if save:
+            with profiling.timed("save", item=output, rows_out=len(result)):
+                module.save(result, **extra)
+
+    records = profiling.RECORDS[mark:]
+    del profiling.RECORDS[mark:]
+    return {
+        "result": result,
+        "fingerprint": fingerprint,
+        "start": start,
+        "end": time.perf_counter(),
+        "records": records,
+    }
+
+
+def critical_path(deps, durations):
+    """Longest chain of dependent steps: (steps in order, total seconds)."""
+    finish = {}
+    before = {}
+    for step in deps:   # deps is in STEPS order, which is topological
+        prev = max(deps[step], key=lambda d: finish[d], default=None)
+        before[step] = prev
+        finish[step] = durations.get(step, 0.0) + (finish[prev] if prev else 0.0)
+
+    if not finish:
+        return [], 0.0
+
+    step = max(finish, key=finish.get)
+    total = finish[step]
+    chain = []
+    while step is not None:
+        chain.append(step)
+        step = before[step]
+    return chain[::-1], total
+
+
+def report(deps, timing, wall):
+    """Print and record the critical path of a run (timing: {step: (start_s, end_s)})."""
+    durations = {step: end - start for step, (start, end) in timing.items()}
+    chain, total = critical_path(deps, durations)
+    names = " → ".join(Path(step).stem.split("_")[0] for step in chain)
+
+    print(f"[INFO] Critical path: {names} = {total:.2f} s "
+          f"(steps total {sum(durations.values()):.2f} s, wall {wall:.2f} s)")
+    profiling.record("critical_path", total, item=names)
+    return chain, total
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 """
-Step 1 — Extract daily SST (Habukuchi station = 波浮口) from all PDF files in temp/.
+Step 1 — Extract daily SST of every station from all PDF files in temp/.
 
 PDF structure:
     日 波浮口 若郷 野伏 ...
@@ -11,37 +11,114 @@ PDF structure:
     ...
 
 We extract:
-    day = first number in line
-    sst = second number in line  → 波浮口（水温）
+    stations = header row (the line containing 波浮口), without 日
+    day      = first number in line
+    values   = following fields, one per station (欠測 etc. → NaN)
 
 Output:
+    output/dataset/SST_stations.npz
+        date + one array per station (all stations, columnar:
+        load_stations() reads only the requested stations)
     output/dataset/CDST.csv
+        date, sst of the selected station (default 波浮口 = Habukuchi),
+        from its first to its last day with a value
+
+Extraction backends (EXTRACTOR, or the IZU_SST_EXTRACTOR variable):
+    template    column template: the x-position of every station is
+                taken from the header row, then each word of pdfium's
+                character stream (pypdfium2, installed with pdfplumber)
+                is put in its row and column directly; no text layout
+                analysis. Falls back to pdfplumber if a page does not fit.
+    pdfplumber  page.extract_text() + line regex (the original parser)
+    check       both, warning on any difference (pdfplumber result kept)
+
+In-situ loggers:
+    Temperature logger files in loggers/ (see loggers.py) are reduced to
+    daily values and added as stations named after the file
+    (<station>_<any>.csv / .bin). A logger station with the name of a
+    PDF station replaces the PDF values on the days it covers. When the
+    selected station is a logger, CDST also gets its daily sst_min,
+    sst_max and sst_range (sst is the daily mean).
+
+Parse cache:
+    The table extracted from each PDF is kept in output/cache/sst/ as
+    <stem>-<content hash>-v<PARSER_VERSION>.npz. Unchanged PDFs are read
+    from the cache; the others are parsed in parallel (one process per
+    PDF). Bump PARSER_VERSION whenever the parsing rules change.
+    The cache is also the checkpoint of step1: each PDF is cached as soon
+    as it is parsed, and a PDF that fails does not stop the others, so
+    an interrupted or failed run resumes with the PDFs not cached yet.
 """
 
-import pdfplumber
-import pandas as pd
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 from pathlib import Path
 import re
 
+from lazy import lazy_import
+import loggers
+from manifest import file_sha256
+from profiling import record, timed_call
+from storage import atomic_write, read_table, write_table
+
+pd = lazy_import("pandas")
+
 TEMP_DIR = Path("temp")
 OUTDIR = Path("output/dataset")
-OUTDIR.mkdir(parents=True, exist_ok=True)
+OUTFILE = OUTDIR / "CDST.csv"
+STATIONS_FILE = OUTDIR / "SST_stations.npz"
+CACHE_DIR = Path("output/cache/sst")
+
+PARSER_VERSION = 2
+
+# Declared inputs / outputs (used by run_pipeline.py for caching)
+INPUTS = [TEMP_DIR / "*.pdf"] + [loggers.LOGGER_DIR / p for p in loggers.PATTERNS]
+OUTPUTS = [OUTFILE, STATIONS_FILE]
 
 # Japanese station name (Habukuchi)
 TARGET_STATION_JP = "波浮口"
 
+# First column of the header row
+DAY_LABEL_JP = "日"
 
-def extract_sst_from_pdf(pdf_path):
+# Extraction backend: "template" (fast), "pdfplumber" or "check"
+EXTRACTOR = os.environ.get("IZU_SST_EXTRACTOR", "template")
+
+# Words whose vertical positions differ by less than this (pt) share a row
+ROW_TOLERANCE = 2.0
+
+DAY_LINE = re.compile(r"^\s*(\d{1,2})\s+(.+)$")
+DAY_NUMBER = re.compile(r"\d{1,2}")
+NUMBER = re.compile(r"\d+\.\d|\d+")
+
+
+def parse_value(token):
+    """Numeric value at the start of a table cell, NaN if there is none."""
+    m = NUMBER.match(token)
+    return float(m.group(0)) if m else np.nan
+
+
+def extract_sst_pdfplumber(pdf_path):
     """
-    Extract (date, SST) from the PDF based on text lines.
-    We locate lines beginning with a day number (1–31),
-    then extract the second numeric field as 波浮口 SST.
+    Extract the daily values of every station from the PDF.
+    Station names are taken from the header row; each following line
+    beginning with a day number (1–31) gives one value per station.
+
+    Returns (stations, dates, values) with values[i][k] = value of
+    stations[k] on dates[i].
     """
 
+    import pdfplumber
+
     year = int(pdf_path.stem.split(".")[0])
     month = int(pdf_path.stem.split(".")[1])
 
-    rows = []
+    stations = []
+    columns = [TARGET_STATION_JP]
+    dates = []
+    records = []
 
     with pdfplumber.open(pdf_path) as pdf:
         for page in pdf.pages:
@@ -51,58 +128,426 @@ def extract_sst_from_pdf(pdf_path):
 
             for line in text.splitlines():
 
-                # Skip header lines
+                # Header line → station names of the following rows
                 if TARGET_STATION_JP in line:
+                    columns = [t for t in line.split() if t != DAY_LABEL_JP]
                     continue
 
                 # Find leading day number
-                m = re.match(r"^\s*(\d{1,2})\s+(.+)$", line)
+                m = DAY_LINE.match(line)
                 if not m:
                     continue
 
                 day = int(m.group(1))
-                rest = m.group(2)
+                values = [parse_value(t) for t in m.group(2).split()]
+
+                if all(np.isnan(v) for v in values):
+                    continue
+
+                for name in columns:
+                    if name not in stations:
+                        stations.append(name)
+
+                dates.append(f"{year:04d}-{month:02d}-{day:02d}")
+                records.append(dict(zip(columns, values)))
+
+    values = [[r.get(name, np.nan) for name in stations] for r in records]
+    return stations, dates, values
+
+
+def page_words(textpage):
+    """(text, x0, x1, y) of every word in pdfium's character stream of a page."""
+    n = textpage.count_chars()
+    text = textpage.get_text_range(0, n)
+    if len(text) != n:
+        raise ValueError("character stream and character boxes do not match")
 
-                # Extract all numeric fields from the rest of the line
-                nums = re.findall(r"\d+\.\d|\d+", rest)
+    words = []
+    start = None
+    for i, ch in enumerate(text + " "):
+        if not ch.isspace():
+            if start is None:
+                start = i
+            continue
+        if start is not None:
+            x0, y, _, _ = textpage.get_charbox(start, loose=True)
+            x1 = textpage.get_charbox(i - 1, loose=True)[2]
+            words.append((text[start:i], x0, x1, y))
+            start = None
+    return words
+
+
+def page_rows(words):
+    """Words grouped into rows (top to bottom), each sorted by x."""
+    rows = []
+    last_y = None
+    for word in sorted(words, key=lambda w: (-w[3], w[1])):
+        if last_y is None or last_y - word[3] > ROW_TOLERANCE:
+            rows.append([])
+        rows[-1].append(word)
+        last_y = word[3]
+    return [sorted(row, key=lambda w: w[1]) for row in rows]
+
+
+def extract_sst_template(pdf_path):
+    """
+    Same result as extract_sst_pdfplumber(), using the column positions
+    of the header row instead of the text layout.
+    Raises ValueError if the PDF does not fit the template.
+    """
+    import pypdfium2 as pdfium
 
-                if len(nums) == 0:
+    year = int(pdf_path.stem.split(".")[0])
+    month = int(pdf_path.stem.split(".")[1])
+
+    stations = []
+    columns = None      # station names of the header row
+    bounds = None       # x boundaries between the columns
+    dates = []
+    records = []
+
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        for page in pdf:
+            textpage = page.get_textpage()
+            try:
+                rows = page_rows(page_words(textpage))
+            finally:
+                textpage.close()
+                page.close()
+
+            for row in rows:
+                texts = [w[0] for w in row]
+
+                # Header row → column template
+                if TARGET_STATION_JP in texts:
+                    header = [w for w in row if w[0] != DAY_LABEL_JP]
+                    columns = [w[0] for w in header]
+                    centers = np.array([(w[1] + w[2]) / 2 for w in header])
+                    gaps = np.diff(centers) / 2
+                    first_gap = gaps[0] if len(gaps) else header[0][2] - header[0][1]
+                    bounds = np.concatenate([[centers[0] - first_gap], centers[:-1] + gaps])
                     continue
 
-                # 波浮口 = first numeric field after day
-                sst_text = nums[0]
+                if columns is None:
+                    continue
 
-                try:
-                    sst = float(sst_text)
-                except:
+                # Day number left of the first station column
+                day_word = row[0]
+                if not DAY_NUMBER.fullmatch(day_word[0]) or day_word[2] > bounds[0]:
                     continue
 
-                date = f"{year:04d}-{month:02d}-{day:02d}"
-                rows.append([date, sst])
+                cells = [np.nan] * len(columns)
+                for text, x0, x1, _ in row[1:]:
+                    col = int(np.searchsorted(bounds, (x0 + x1) / 2)) - 1
+                    if 0 <= col < len(columns) and np.isnan(cells[col]):
+                        cells[col] = parse_value(text)
 
-    return rows
+                if all(np.isnan(v) for v in cells):
+                    continue
 
+                for name in columns:
+                    if name not in stations:
+                        stations.append(name)
 
-def main():
-    all_rows = []
+                dates.append(f"{year:04d}-{month:02d}-{int(day_word[0]):02d}")
+                records.append(dict(zip(columns, cells)))
+    finally:
+        pdf.close()
 
-    for pdf in sorted(TEMP_DIR.glob("*.pdf")):
-        print(f"[INFO] Processing {pdf.name}")
-        extracted = extract_sst_from_pdf(pdf)
-        all_rows.extend(extracted)
+    if not records:
+        raise ValueError("no table rows found")
 
-    if not all_rows:
-        print("[ERROR] No SST records extracted.")
-        return
+    values = [[r.get(name, np.nan) for name in stations] for r in records]
+    return stations, dates, values
+
+
+def same_extraction(a, b):
+    """True if two (stations, dates, values) results are equal."""
+    return (
+        list(a[0]) == list(b[0]) and list(a[1]) == list(b[1])
+        and np.array_equal(np.asarray(a[2], dtype=float), np.asarray(b[2], dtype=float), equal_nan=True)
+    )
+
+
+def extract_sst_from_pdf(pdf_path, extractor=None):
+    """
+    Extract the daily values of every station from the PDF with the
+    configured backend (see EXTRACTOR).
+
+    Returns (stations, dates, values) with values[i][k] = value of
+    stations[k] on dates[i].
+    """
+    extractor = extractor or EXTRACTOR
+    if extractor == "pdfplumber":
+        return extract_sst_pdfplumber(pdf_path)
+
+    try:
+        from pypdfium2 import PdfiumError   # e.g. a PDF pdfium cannot load
+    except ImportError:
+        PdfiumError = ValueError            # extract_sst_template raises the ImportError
+
+    try:
+        fast = extract_sst_template(pdf_path)
+    except (ImportError, ValueError, PdfiumError) as exc:
+        print(f"[WARN] {pdf_path.name}: column template not usable ({exc}) → pdfplumber")
+        return extract_sst_pdfplumber(pdf_path)
+
+    if extractor == "check":
+        slow = extract_sst_pdfplumber(pdf_path)
+        if not same_extraction(fast, slow):
+            print(f"[WARN] {pdf_path.name}: template and pdfplumber results differ")
+        return slow
+
+    return fast
+
+
+def cache_path(pdf_path, digest):
+    return CACHE_DIR / f"{pdf_path.stem}-{digest[:16]}-v{PARSER_VERSION}.npz"
+
+
+def read_cache(path):
+    with np.load(path) as data:
+        return data["stations"].tolist(), data["date"].tolist(), data["values"]
+
+
+def write_cache(path, extracted, pdf_stem):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Drop entries of older versions of the same PDF
+    for old in CACHE_DIR.glob(f"{pdf_stem}-*.npz"):
+        if old != path:
+            old.unlink()
+
+    stations, dates, values = extracted
+    with atomic_write(path) as tmp:
+        np.savez_compressed(
+            tmp,
+            stations=np.array(stations, dtype=str),
+            date=np.array(dates, dtype="U10"),
+            values=np.array(values, dtype=np.float64).reshape(len(dates), len(stations)),
+        )
 
-    df = pd.DataFrame(all_rows, columns=["date", "sst"])
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df = df.dropna().sort_values("date")
 
-    outpath = OUTDIR / "CDST.csv"
-    df.to_csv(outpath, index=False, encoding="utf-8-sig")
+def iter_extracted(pdf_paths, jobs=None):
+    """
+    Yield (stations, dates, values) of every PDF, in the given order,
+    using the parse cache where possible. Cache misses are parsed in a
+    process pool.
+
+    Each PDF is cached as soon as it is parsed. A PDF that cannot be
+    parsed is reported and skipped; ValueError is raised after the last
+    PDF, so a re-run parses only the failed ones.
+    """
+    keyed = [(pdf, cache_path(pdf, file_sha256(pdf))) for pdf in pdf_paths]
+    misses = [(pdf, cached) for pdf, cached in keyed if not cached.exists()]
+    missed = {pdf for pdf, _ in misses}
+
+    print(f"[INFO] {len(keyed) - len(misses)} PDFs from cache, {len(misses)} to parse")
+
+    pool = None
+    if len(misses) > 1 and (jobs is None or jobs > 1):
+        pool = ProcessPoolExecutor(max_workers=jobs or os.cpu_count())
+        futures = {pdf: pool.submit(timed_call, extract_sst_from_pdf, pdf) for pdf, _ in misses}
+
+    failed = []
+    try:
+        for pdf, cached in keyed:
+            if pdf not in missed:
+                yield read_cache(cached)
+                continue
+
+            try:
+                if pool is None:
+                    print(f"[INFO] Processing {pdf.name}")
+                    extracted, wall, cpu = timed_call(extract_sst_from_pdf, pdf)
+                else:
+                    extracted, wall, cpu = futures[pdf].result()
+                    print(f"[INFO] Processed {pdf.name}")
+            except Exception as exc:
+                print(f"[FAIL] {pdf.name}: {exc!r}")
+                failed.append(pdf.name)
+                continue
+
+            record("parse_pdf", wall, cpu, item=pdf.name, rows_out=len(extracted[1]))
+
+            write_cache(cached, extracted, pdf.stem)
+            yield extracted
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    if failed:
+        raise ValueError(
+            f"{len(failed)} of {len(keyed)} PDFs could not be parsed ({', '.join(failed)}); "
+            "the others are cached"
+        )
+
+
+def extract_all(pdf_paths, jobs=None):
+    """(stations, dates, values) of every PDF, as a list."""
+    return list(iter_extracted(pdf_paths, jobs=jobs))
+
+
+def stations_frame(extracted):
+    """Wide (date × station) table of one PDF, sorted by date."""
+    stations, dates, values = extracted
+    frame = pd.DataFrame(np.asarray(values, dtype=np.float64).reshape(len(dates), len(stations)),
+                         columns=stations)
+    frame.insert(0, "date", pd.to_datetime(pd.Series(dates, dtype=object), errors="coerce"))
+    return frame.dropna(subset=["date"]).sort_values("date", kind="stable")
+
+
+def add_loggers(wide, logger_stations):
+    """Add the daily means of the logger stations to the wide table."""
+    for name, daily in logger_stations.items():
+        series = daily[["date", "sst"]].rename(columns={"sst": name})
+        if wide is None:
+            wide = series
+            continue
+
+        series = series.assign(date=series["date"].astype(wide["date"].dtype))
+        if name not in wide.columns:
+            wide = wide.merge(series, on="date", how="outer", sort=True)
+            continue
+
+        # logger values first, the PDF values where the logger has none
+        wide = wide.merge(series.rename(columns={name: "_logger"}), on="date", how="outer", sort=True)
+        wide[name] = wide.pop("_logger").fillna(wide[name])
+
+    return wide
+
+
+def build_stations(pdf_paths=None, jobs=None, logger_stations=None):
+    """
+    Build the wide (date × station) SST table from the monthly PDFs and
+    the loggers (logger_stations: {station: daily table}, by default
+    read from loggers/). Returns None when no SST record could be extracted.
+    """
+    if pdf_paths is None:
+        pdf_paths = sorted(TEMP_DIR.glob("*.pdf"))
+    if logger_stations is None:
+        logger_stations = loggers.build_logger_stations(jobs=jobs)
+
+    frames = [
+        stations_frame(extracted)
+        for extracted in iter_extracted(pdf_paths, jobs=jobs)
+        if len(extracted[1]) > 0
+    ]
+
+    wide = None
+    if frames:
+        wide = pd.concat(frames, ignore_index=True, sort=False)
+        wide = wide.sort_values("date", kind="stable")
+    wide = add_loggers(wide, logger_stations)
+
+    if wide is None:
+        return None
+    return wide.reset_index(drop=True)
+
+
+def select_station(wide, station=TARGET_STATION_JP, trim=True):
+    """
+    CDST table (date, sst) of one station from the wide table. With trim,
+    it runs from the first to the last day with a value of the station.
+    """
+    if station not in wide.columns:
+        raise KeyError(f"Station not found in SST data: {station}")
+
+    # Days on which the station is missing keep sst = NaN so that the
+    # CDST timeline stays continuous.
+    cdst = wide[["date", station]].rename(columns={station: "sst"})
+
+    # the days before / after the station's record only come from other
+    # stations (e.g. a logger covering a longer period)
+    valid = np.flatnonzero(cdst["sst"].notna().to_numpy())
+    if trim and len(valid):
+        cdst = cdst.iloc[valid[0]:valid[-1] + 1].reset_index(drop=True)
+    return cdst
+
+
+def save_stations(wide, outpath=STATIONS_FILE):
+    """Store the wide table column by column (one npz member per station)."""
+    stations = [c for c in wide.columns if c != "date"]
+    with atomic_write(outpath) as tmp:
+        np.savez_compressed(
+            tmp,
+            date=wide["date"].to_numpy(dtype="datetime64[D]"),
+            stations=np.array(stations, dtype=str),
+            **{name: wide[name].to_numpy(dtype=np.float64) for name in stations},
+        )
+    print(f"[INFO] Saved {len(stations)} stations × {len(wide)} days → {outpath}")
+
+
+def load_stations(stations=None, path=STATIONS_FILE):
+    """
+    Load the wide SST table. Only the requested stations (by name) are
+    read from disk; all stations if stations is None.
+    """
+    with np.load(path) as data:
+        available = data["stations"].tolist()
+        if stations is None:
+            stations = available
+
+        missing = [s for s in stations if s not in available]
+        if missing:
+            raise KeyError(f"Stations not found in {path}: {missing}")
+
+        df = pd.DataFrame({"date": pd.to_datetime(data["date"])})
+        for name in stations:
+            df[name] = data[name]
+
+    return df
+
+
+def build(pdf_paths=None, jobs=None, station=TARGET_STATION_JP):
+    """
+    Build the continuous daily SST (CDST) table of one station and the
+    wide table of all stations from the monthly PDFs and loggers. Writes
+    nothing; returns (cdst, {"stations": wide}), the second item being
+    the keyword arguments of save(), or None when no SST record could be
+    extracted.
+    """
+    logger_stations = loggers.build_logger_stations(jobs=jobs)
+    wide = build_stations(pdf_paths, jobs=jobs, logger_stations=logger_stations)
+    if wide is None:
+        return None
+
+    cdst = select_station(wide, station)
+
+    if station in logger_stations:
+        extra = logger_stations[station][["date", "sst_min", "sst_max", "sst_range"]]
+        cdst = cdst.merge(extra.assign(date=extra["date"].astype(cdst["date"].dtype)), on="date", how="left")
+    return cdst, {"stations": wide}
+
+
+def build_cdst(pdf_paths=None, jobs=None, station=TARGET_STATION_JP):
+    """CDST table of one station (see build); None when no SST record could be extracted."""
+    built = build(pdf_paths, jobs, station)
+    return None if built is None else built[0]
+
+
+def save(df, outpath=OUTFILE, stations=None):
+    """Write the CDST table and, if given, the wide table of all stations."""
+    outpath = write_table(df, outpath, encoding="utf-8-sig")
+    print(f"[INFO] Saved {outpath.name} with {len(df)} rows → {outpath}")
+    if stations is not None:
+        save_stations(stations)
+
+
+def load(path=OUTFILE, columns=None):
+    return read_table(path, columns)
+
+
+def main():
+    built = build()
+
+    if built is None:
+        print("[ERROR] No SST records extracted.")
+        return
 
-    print(f"[INFO] Saved CDST.csv with {len(df)} rows → {outpath}")
+    cdst, outputs = built
+    save(cdst, **outputs)
 
 
 if __name__ == "__main__":
@@ -20,42 +20,45 @@ Notes:
     - Missing days are excluded (as defined in the Methods).
 """
 
-import pandas as pd
 from pathlib import Path
 
+from lazy import lazy_import
+from storage import read_table, write_table
+
+pd = lazy_import("pandas")
+
 # Input files
 PHOTO_LIST = Path("photo/photo_list.csv")
 
 # Output directory
 OUTDIR = Path("output/dataset")
-OUTDIR.mkdir(parents=True, exist_ok=True)
+OUTFILE = OUTDIR / "DCP.csv"
+
+# Declared inputs / outputs (used by run_pipeline.py for caching)
+INPUTS = [PHOTO_LIST]
+OUTPUTS = [OUTFILE]
 
 # Mapping o/p/t → 0/1/2
 PHASE_MAP = {"o": 0, "p": 1, "t": 2}
 
 
-def main():
-    print("[INFO] Step2: Building DCP dataset")
-
-    if not PHOTO_LIST.exists():
-        raise FileNotFoundError("photo_list.csv not found in current directory.")
-
-    # Load photo_list.csv
-    df = pd.read_csv(PHOTO_LIST)
-
-    # Basic check
-    if "date" not in df.columns or "phase" not in df.columns:
-        raise ValueError("photo_list.csv must contain columns: date, phase")
-
+def to_dcp(df):
+    """
+    Numeric phase and parsed date for photo_list rows; invalid rows dropped.
+    Rows without a valid phase (not annotated yet, duplication, unknown
+    values) are dropped with a warning; the other rows are kept.
+    """
     # Normalize phase values
     df["phase"] = df["phase"].astype(str).str.strip().str.lower()
 
-    # Map phase to numeric values
-    if set(df["phase"].unique()).issubset(set(PHASE_MAP.keys())):
-        df["phase_num"] = df["phase"].map(PHASE_MAP)
-    else:
-        # fallback: numeric input
-        df["phase_num"] = pd.to_numeric(df["phase"], errors="coerce")
+    # Map phase to numeric values, row by row: o/p/t, or a numeric 0/1/2
+    numeric = pd.to_numeric(df["phase"], errors="coerce")
+    df["phase_num"] = df["phase"].map(PHASE_MAP).fillna(numeric.where(numeric.isin(PHASE_MAP.values())))
+
+    unknown = int(df["phase_num"].isna().sum())
+    if unknown:
+        print(f"[WARN] {unknown} of {len(df)} photo_list rows without a valid phase "
+              "(blank, duplication or unknown) → skipped")
 
     # Parse date
     df["date"] = pd.to_datetime(
@@ -66,17 +69,45 @@ def main():
 
     # Remove invalid rows
     df = df.dropna(subset=["date", "phase_num"]).copy()
+    df["phase_num"] = df["phase_num"].astype("int64")
+    return df
+
+
+def build_dcp(photo_list=PHOTO_LIST):
+    """Read photo_list.csv and return the sorted DCP table."""
+    if not photo_list.exists():
+        raise FileNotFoundError("photo_list.csv not found in current directory.")
+
+    # Load photo_list.csv
+    df = pd.read_csv(photo_list)
+
+    # Basic check
+    if "date" not in df.columns or "phase" not in df.columns:
+        raise ValueError("photo_list.csv must contain columns: date, phase")
+
+    df = to_dcp(df)
 
     # Sort
     df = df.sort_values("date").reset_index(drop=True)
 
-    # Output file
-    outfile = OUTDIR / "DCP.csv"
-    df.to_csv(outfile, index=False)
+    return df
+
+
+def save(df, outfile=OUTFILE):
+    outfile = write_table(df, outfile)
 
     print(f"[INFO] DCP dataset saved → {outfile}")
     print(f"[INFO] Total valid records: {len(df)}")
 
 
+def load(path=OUTFILE, columns=None):
+    return read_table(path, columns)
+
+
+def main():
+    print("[INFO] Step2: Building DCP dataset")
+    save(build_dcp())
+
+
 if __name__ == "__main__":
     main()
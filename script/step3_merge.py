@@ -10,41 +10,144 @@ Input:
         columns: date, sst_habukuchi
     output/dataset/DCP.csv
         columns: date, phase_num
+    output/dataset/SST_stations.npz   (only for colonies of other stations)
+    photo/colony_stations.csv         (optional: colony_id, station)
 
 Output:
     output/dataset/merged_dataset.csv
         columns: date, sst_habukuchi, phase_num
+        (multi-colony: colony_id, station, date, sst, phase_num, ...)
 
 Notes:
-    - Left merge (CDST is the reference timeline)
+    - Left merge (the SST series is the reference timeline)
     - Days without photographs keep phase_num = NaN
+
+Multiple colonies / stations:
+    If DCP has a colony_id column (or TOLERANCE is set), every colony is
+    joined to the SST series of its station in one sorted as-of join
+    (pd.merge_asof, by colony): each SST row gets the colony's phase
+    record nearest in time, within TOLERANCE. The result is one long
+    table sorted by (colony_id, date).
+
+    The station of a colony is taken from a station column of DCP, else
+    from photo/colony_stations.csv, else the station of the CDST series
+    (step1 TARGET_STATION_JP).
+    TOLERANCE = None means exact dates (the same result as the left merge).
 """
 
-import pandas as pd
 from pathlib import Path
 
+from lazy import lazy_import
+from step1_extract_sst import STATIONS_FILE, TARGET_STATION_JP, load_stations
+from step4_detect_takeover import GROUP_KEY
+from storage import exists, read_table, write_table
+
+pd = lazy_import("pandas")
+
 # Paths
 DATASET_DIR = Path("output/dataset")
 CDST = DATASET_DIR / "CDST.csv"
 DCP = DATASET_DIR / "DCP.csv"
+COLONY_STATIONS = Path("photo/colony_stations.csv")
 OUTFILE = DATASET_DIR / "merged_dataset.csv"
 
-
-def main():
-    print("[INFO] Step3: Merging CDST × DCP")
-
-    if not CDST.exists():
-        raise FileNotFoundError("CDST.csv not found in output/dataset/")
-    if not DCP.exists():
-        raise FileNotFoundError("DCP.csv not found in output/dataset/")
-
-    # Load datasets
-    sst = pd.read_csv(CDST)
-    dcp = pd.read_csv(DCP)
-
-    # Parse date
-    sst["date"] = pd.to_datetime(sst["date"])
-    dcp["date"] = pd.to_datetime(dcp["date"])
+# Declared inputs / outputs (used by run_pipeline.py for caching)
+INPUTS = [CDST, DCP, STATIONS_FILE, COLONY_STATIONS]
+OUTPUTS = [OUTFILE]
+
+# As-of join: maximum distance between an SST row and a phase record
+# (e.g. "12h" for sub-daily logs, "1D"), and which record to take
+# ("nearest", "backward" = last record before, "forward")
+TOLERANCE = None
+DIRECTION = "nearest"
+
+
+def colony_stations(dcp, mapping=COLONY_STATIONS):
+    """Table colony_id → station for every colony of DCP."""
+    colonies = pd.DataFrame({GROUP_KEY: pd.unique(dcp[GROUP_KEY])})
+
+    if "station" in dcp.columns:
+        chosen = dcp.dropna(subset=["station"]).drop_duplicates(GROUP_KEY)[[GROUP_KEY, "station"]]
+    elif Path(mapping).exists():
+        chosen = pd.read_csv(mapping, dtype={GROUP_KEY: colonies[GROUP_KEY].dtype})
+        if GROUP_KEY not in chosen.columns or "station" not in chosen.columns:
+            raise ValueError(f"{mapping} must contain columns: {GROUP_KEY}, station")
+        chosen = chosen.drop_duplicates(GROUP_KEY)[[GROUP_KEY, "station"]]
+    else:
+        chosen = pd.DataFrame(columns=[GROUP_KEY, "station"])
+
+    colonies = colonies.merge(chosen, on=GROUP_KEY, how="left")
+    colonies["station"] = colonies["station"].fillna(TARGET_STATION_JP)
+    return colonies
+
+
+def station_series(sst, stations, wide=None):
+    """
+    Long (station, date, sst) table of the requested stations. The
+    default station comes from CDST, the others from the station table
+    (SST_stations.npz unless given as a wide DataFrame).
+    """
+    parts = []
+    if TARGET_STATION_JP in stations:
+        parts.append(sst[["date", "sst"]].assign(station=TARGET_STATION_JP))
+
+    others = [s for s in stations if s != TARGET_STATION_JP]
+    if others:
+        if wide is None:
+            wide = load_stations(others, STATIONS_FILE)
+        parts.append(wide.melt(id_vars="date", value_vars=others, var_name="station", value_name="sst"))
+
+    series = pd.concat(parts, ignore_index=True)
+    series["date"] = pd.to_datetime(series["date"])
+    return series
+
+
+def asof_merge(sst, dcp, wide=None, tolerance=TOLERANCE, direction=DIRECTION):
+    """
+    Join every colony to the SST series of its station with one sorted
+    as-of join. Returns the long table sorted by (colony_id, date).
+    """
+    if GROUP_KEY not in dcp.columns:
+        dcp = dcp.assign(**{GROUP_KEY: ""})
+        single = True
+    else:
+        single = False
+
+    colonies = colony_stations(dcp)
+    series = station_series(sst, colonies["station"].unique().tolist(), wide)
+
+    # reference timeline: the station series repeated for each of its colonies
+    timeline = colonies.merge(series, on="station").sort_values("date", kind="stable")
+
+    records = dcp.drop(columns="station", errors="ignore")
+    records = records.assign(date=records["date"].astype(series["date"].dtype)).sort_values("date", kind="stable")
+
+    merged = pd.merge_asof(
+        timeline,
+        records,
+        on="date",
+        by=GROUP_KEY,
+        direction=direction,
+        tolerance=pd.Timedelta(tolerance or 0),
+    )
+
+    merged = merged.sort_values([GROUP_KEY, "date"], kind="stable").reset_index(drop=True)
+    front = [GROUP_KEY, "station", "date", "sst"]
+    merged = merged[front + [c for c in merged.columns if c not in front]]
+
+    if single:
+        merged = merged.drop(columns=[GROUP_KEY, "station"])
+    return merged
+
+
+def merge_datasets(sst, dcp, wide=None, tolerance=TOLERANCE, direction=DIRECTION):
+    """Left-merge DCP onto the SST timeline and sort by date (per colony if any)."""
+    # Parse date (without mutating the caller's frames)
+    sst = sst.assign(date=pd.to_datetime(sst["date"]))
+    dcp = dcp.assign(date=pd.to_datetime(dcp["date"]))
+
+    if GROUP_KEY in dcp.columns or tolerance is not None:
+        return asof_merge(sst, dcp, wide, tolerance, direction)
 
     # Left merge: all SST rows kept, phase added when available
     merged = pd.merge(sst, dcp, on="date", how="left")
@@ -52,12 +155,36 @@ def main():
     # Sort output
     merged = merged.sort_values("date").reset_index(drop=True)
 
-    # Save
-    merged.to_csv(OUTFILE, index=False)
+    return merged
+
 
-    print(f"[INFO] Saved merged dataset → {OUTFILE}")
+def save(merged, outfile=OUTFILE):
+    outfile = write_table(merged, outfile)
+
+    print(f"[INFO] Saved merged dataset → {outfile}")
     print(f"[INFO] Total rows: {len(merged)}")
     print(f"[INFO] Date range: {merged['date'].min()} → {merged['date'].max()}")
+    if GROUP_KEY in merged.columns:
+        print(f"[INFO] Colonies: {merged[GROUP_KEY].nunique()}")
+
+
+def load(path=OUTFILE, columns=None):
+    return read_table(path, columns)
+
+
+def main():
+    print("[INFO] Step3: Merging CDST × DCP")
+
+    if not exists(CDST):
+        raise FileNotFoundError("CDST table not found in output/dataset/")
+    if not exists(DCP):
+        raise FileNotFoundError("DCP table not found in output/dataset/")
+
+    # Load datasets
+    sst = read_table(CDST)
+    dcp = read_table(DCP)
+
+    save(merge_datasets(sst, dcp))
 
 
 if __name__ == "__main__":
@@ -13,58 +13,113 @@ Definition:
     - A takeover period ends the last consecutive or missing-data-
       bridged t-day before returning to phase 0 or 1.
     - Missing days between t-days are treated as part of the period.
+    - With a colony_id column, periods are detected per colony.
 
 Output:
     output/takeover_phase/general_takeover_periods.csv
 """
 
-import pandas as pd
+import numpy as np
 from pathlib import Path
 
+from lazy import lazy_import
+from storage import read_table, write_table
+
+pd = lazy_import("pandas")
+
 DCP = Path("output/dataset/DCP.csv")
 OUTDIR = Path("output/takeover_phase")
-OUTDIR.mkdir(parents=True, exist_ok=True)
 OUTFILE = OUTDIR / "general_takeover_periods.csv"
 
+# Declared inputs / outputs (used by run_pipeline.py for caching)
+INPUTS = [DCP]
+OUTPUTS = [OUTFILE]
 
-def main():
-    df = pd.read_csv(DCP)
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values("date").reset_index(drop=True)
+# Optional column identifying the colony of each record
+GROUP_KEY = "colony_id"
+
+
+def takeover_runs(phase, first=None):
+    """
+    Start / end positions of the general takeover periods in a phase array.
+
+    phase : float array (0, 1, 2 or NaN), sorted by date
+    first : boolean array marking the first row of each group
+            (colony); by default only row 0
+
+    The array is run-length encoded into "bridged" runs of t or missing
+    days, which never cross a group boundary. A period starts on a t-day
+    whose previous row is o/p (or that opens a group) and ends at the
+    last row of its bridged run.
+    """
+    phase = np.asarray(phase, dtype=float)
+    n = len(phase)
+
+    if first is None:
+        first = np.zeros(n, dtype=bool)
+        first[:1] = True
+
+    is_t = phase == 2
+    bridged = is_t | np.isnan(phase)
+
+    prev_op = np.zeros(n, dtype=bool)
+    prev_op[1:] = (phase[:-1] == 0) | (phase[:-1] == 1)
+    starts = np.flatnonzero(is_t & (prev_op | first))
 
-    periods = []
-    n = len(df)
-    i = 0
+    # A run stops before every non-bridged row and before every group start
+    stops = np.flatnonzero(~bridged | first)
+    k = np.searchsorted(stops, starts, side="right")
+    ends = np.where(k < len(stops), stops[np.minimum(k, len(stops) - 1)] - 1, n - 1)
 
-    while i < n:
-        # detect start of takeover
-        if df.loc[i, "phase_num"] == 2:
-            if i == 0 or df.loc[i - 1, "phase_num"] in (0, 1):
+    return starts, ends
 
-                start = df.loc[i, "date"]
-                j = i
 
-                # extend through t or missing
-                while j + 1 < n and (
-                    pd.isna(df.loc[j + 1, "phase_num"]) or df.loc[j + 1, "phase_num"] == 2
-                ):
-                    j += 1
+def detect_general_takeover(dcp, group_key=GROUP_KEY):
+    """
+    Return the general takeover periods found in a DCP table.
+    If the table has a group_key column (colony), all colonies are
+    processed in one pass and the key is kept in the output.
+    """
+    grouped = group_key in dcp.columns
+    keys = [group_key, "date"] if grouped else ["date"]
 
-                end = df.loc[j, "date"]
+    df = dcp.assign(date=pd.to_datetime(dcp["date"]))
+    df = df.sort_values(keys, kind="stable").reset_index(drop=True)
 
-                periods.append({
-                    "start_date": start.date(),
-                    "end_date": end.date(),
-                    "duration_general": (end - start).days + 1
-                })
+    first = None
+    if grouped:
+        group = df[group_key].to_numpy()
+        first = np.ones(len(df), dtype=bool)
+        first[1:] = group[1:] != group[:-1]
 
-                i = j + 1
-                continue
+    starts, ends = takeover_runs(df["phase_num"].to_numpy(dtype=float), first)
 
-        i += 1
+    start = df["date"].to_numpy()[starts]
+    end = df["date"].to_numpy()[ends]
 
-    pd.DataFrame(periods).to_csv(OUTFILE, index=False)
-    print(f"[INFO] Saved general takeover periods → {OUTFILE}")
+    periods = pd.DataFrame({
+        "start_date": pd.Series(start).dt.date,
+        "end_date": pd.Series(end).dt.date,
+        "duration_general": (end - start) // np.timedelta64(1, "D") + 1,
+    })
+
+    if grouped:
+        periods.insert(0, group_key, df[group_key].to_numpy()[starts])
+
+    return periods
+
+
+def save(periods, outfile=OUTFILE):
+    outfile = write_table(periods, outfile)
+    print(f"[INFO] Saved general takeover periods → {outfile}")
+
+
+def load(path=OUTFILE, columns=None):
+    return read_table(path, columns)
+
+
+def main():
+    save(detect_general_takeover(read_table(DCP, [GROUP_KEY, "date", "phase_num"])))
 
 
 if __name__ == "__main__":
@@ -6,57 +6,211 @@ step5_onset_temp_windows.py
 -----------------------------------------
 Compute 3-, 5-, 7-day temperature windows preceding takeover onset.
 
+The statistics of every window size are computed for all rows of the
+SST series in one pass (rolling_stats); each onset then simply picks
+its row from the precomputed arrays.
+
+Windows:
+    rows     (default) the onset row and the size-1 rows before it
+    calendar the onset day and the size-1 calendar days before it;
+             days missing from CDST count as missing values instead
+             of stretching the window
+    With a colony_id column (multi-colony merged table), onsets and
+    windows are found per colony: a window never reaches into the rows
+    of the previous colony.
+
+Statistics:
+    mean, median, min, max (default), std,
+    degdays (degree-days above DEGREE_DAY_BASE), slope (°C per day)
+
 Output:
     output/takeover_phase/onset_temperature_windows.csv
 """
 
-import pandas as pd
+import warnings
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from pathlib import Path
 
+from lazy import lazy_import
+from step4_detect_takeover import GROUP_KEY
+from storage import read_table, write_table
+
+pd = lazy_import("pandas")
+
 MERGED = Path("output/dataset/merged_dataset.csv")
 OUTDIR = Path("output/takeover_phase")
-OUTDIR.mkdir(parents=True, exist_ok=True)
 OUTFILE = OUTDIR / "onset_temperature_windows.csv"
 
+# Declared inputs / outputs (used by run_pipeline.py for caching)
+INPUTS = [MERGED]
+OUTPUTS = [OUTFILE]
 
-def window_stats(df, idx, size):
-    start = max(0, idx - (size - 1))
-    sub = df.iloc[start:idx + 1]["sst"].dropna()
-    if len(sub) == 0:
-        return None
-    return {
-        "mean": sub.mean(),
-        "median": sub.median(),
-        "min": sub.min(),
-        "max": sub.max(),
-    }
+WINDOWS = (3, 5, 7)
+STATS = ("mean", "median", "min", "max")
 
+# Base temperature (°C) of the degdays statistic
+DEGREE_DAY_BASE = 25.0
+
+
+def _slope(win, valid):
+    """Least-squares slope of each window row against its position."""
+    x = np.arange(win.shape[1], dtype=float)
+    count = valid.sum(axis=1)
+    x_mean = np.where(valid, x, 0.0).sum(axis=1) / count
+    y_mean = np.where(valid, win, 0.0).sum(axis=1) / count
+    dx = np.where(valid, x - x_mean[:, None], 0.0)
+    dy = np.where(valid, win - y_mean[:, None], 0.0)
+    sxx = (dx * dx).sum(axis=1)
+    return np.where(count >= 2, (dx * dy).sum(axis=1) / sxx, np.nan)
 
-def main():
-    df = pd.read_csv(MERGED)
-    df["date"] = pd.to_datetime(df["date"])
 
-    rows = []
+def first_rows(groups):
+    """Boolean array marking the first row of each run of equal group values."""
+    groups = np.asarray(groups)
+    first = np.ones(len(groups), dtype=bool)
+    first[1:] = groups[1:] != groups[:-1]
+    return first
 
-    for i in range(1, len(df)):
-        if df.at[i, "phase_num"] == 2 and df.at[i - 1, "phase_num"] in (0, 1):
-            onset = df.at[i, "date"]
-            record = {"onset_date": onset.date()}
 
-            for w in (3, 5, 7):
-                stats = window_stats(df, i, w)
-                if stats:
-                    for k, v in stats.items():
-                        record[f"w{w}_{k}"] = v
+def rolling_stats(values, sizes=WINDOWS, stats=STATS, degree_day_base=DEGREE_DAY_BASE, first=None):
+    """
+    Trailing-window statistics for every row of a 1-D array.
+
+    The window of row i covers rows max(s, i-size+1) .. i, s being the
+    first row of its group (first: boolean array marking the first row
+    of each group; by default only row 0); NaN values are ignored and a
+    window without any value gives NaN.
+    Returns {(size, stat): array of len(values)}.
+    """
+    values = np.asarray(values, dtype=float)
+    longest = max(sizes)
+
+    # One (n × longest) view over the NaN-padded series serves every size
+    padded = np.concatenate([np.full(longest - 1, np.nan), values])
+    view = sliding_window_view(padded, longest)
+
+    if first is not None and np.any(first[1:]):
+        # blank the window cells that belong to the previous group
+        n = len(values)
+        start = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+        lead = start - np.arange(n) + longest - 1   # first column inside the group
+        view = np.where(np.arange(longest)[None, :] >= lead[:, None], view, np.nan)
+
+    result = {}
+
+    # all-NaN windows are expected: silence the empty-slice warnings
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+
+        for size in sizes:
+            win = view[:, longest - size:]
+            valid = ~np.isnan(win)
+            empty = ~valid.any(axis=1)
+
+            for stat in stats:
+                if stat == "mean":
+                    out = np.nanmean(win, axis=1)
+                elif stat == "median":
+                    out = np.nanmedian(win, axis=1)
+                elif stat == "min":
+                    out = np.nanmin(win, axis=1)
+                elif stat == "max":
+                    out = np.nanmax(win, axis=1)
+                elif stat == "std":
+                    out = np.nanstd(win, axis=1, ddof=1)
+                elif stat == "degdays":
+                    out = np.nansum(np.clip(win - degree_day_base, 0, None), axis=1)
+                elif stat == "slope":
+                    out = _slope(win, valid)
                 else:
-                    for k in ("mean", "median", "min", "max"):
-                        record[f"w{w}_{k}"] = None
+                    raise ValueError(f"Unknown window statistic: {stat}")
+
+                out[empty] = np.nan
+                result[(size, stat)] = out
+
+    return result
 
-            rows.append(record)
 
-    out = pd.DataFrame(rows)
-    out.to_csv(OUTFILE, index=False)
-    print(f"[INFO] Saved onset SST windows → {OUTFILE}")
+def onset_positions(phase, first=None):
+    """
+    Rows where phase switches from o/p (0/1) to t (2). With first (boolean
+    array marking the first row of each group), the previous row must be
+    in the same group.
+    """
+    phase = np.asarray(phase, dtype=float)
+    prev = phase[:-1]
+    onset = (phase[1:] == 2) & ((prev == 0) | (prev == 1))
+    if first is not None:
+        onset &= ~np.asarray(first[1:], dtype=bool)
+    return np.flatnonzero(onset) + 1
+
+
+def onset_temperature_windows(merged, sizes=WINDOWS, stats=STATS,
+                              calendar=False, degree_day_base=DEGREE_DAY_BASE, group_key=GROUP_KEY):
+    """
+    Return one row of window statistics per takeover onset.
+    If the table has a group_key column (colony), all colonies are
+    processed in one pass and the key is kept in the output.
+    """
+    grouped = group_key in merged.columns
+    keys = [group_key, "date"] if grouped else ["date"]
+
+    df = merged.assign(date=pd.to_datetime(merged["date"]))
+    df = df.sort_values(keys, kind="stable").reset_index(drop=True)
+    first = first_rows(df[group_key].to_numpy()) if grouped else first_rows(np.zeros(len(df)))
+
+    onsets = onset_positions(df["phase_num"].to_numpy(dtype=float), first)
+    onset_dates = df["date"].to_numpy()[onsets]
+
+    if calendar:
+        # Put each group on a gap-free daily axis: absent days become NaN
+        one_day = np.timedelta64(1, "D")
+        day = df["date"].dt.normalize().to_numpy()
+        group = np.cumsum(first) - 1
+        lo = day[first]
+        hi = day[np.r_[np.flatnonzero(first)[1:], len(df)] - 1]
+        length = (hi - lo) // one_day + 1
+        offset = np.cumsum(length) - length
+
+        daily = pd.Series(df["sst"].to_numpy(dtype=float)).groupby([group, day]).mean()
+        g = daily.index.get_level_values(0).to_numpy()
+        d = daily.index.get_level_values(1).to_numpy()
+        values = np.full(length.sum(), np.nan)
+        values[offset[g] + (d - lo[g]) // one_day] = daily.to_numpy()
+
+        rows = offset[group[onsets]] + (day[onsets] - lo[group[onsets]]) // one_day
+        first = np.zeros(len(values), dtype=bool)
+        first[offset] = True
+    else:
+        values = df["sst"].to_numpy(dtype=float)
+        rows = onsets
+
+    rolled = rolling_stats(values, sizes, stats, degree_day_base, first)
+
+    out = pd.DataFrame({"onset_date": pd.Series(onset_dates).dt.date})
+    for size in sizes:
+        for stat in stats:
+            out[f"w{size}_{stat}"] = rolled[(size, stat)][rows]
+
+    if grouped:
+        out.insert(0, group_key, df[group_key].to_numpy()[onsets])
+
+    return out
+
+
+def save(out, outfile=OUTFILE):
+    outfile = write_table(out, outfile)
+    print(f"[INFO] Saved onset SST windows → {outfile}")
+
+
+def load(path=OUTFILE, columns=None):
+    return read_table(path, columns)
+
+
+def main():
+    save(onset_temperature_windows(read_table(MERGED, [GROUP_KEY, "date", "sst", "phase_num"])))
 
 
 if __name__ == "__main__":
@@ -17,77 +17,98 @@ End:
       (recovery confirmed)
     - if missing continues until dataset end → strict end not defined
 
+Onsets and strict ends are found together in one pass over the phase
+array: each onset is matched to the next non-t, non-missing row with a
+binary search, so the cost no longer grows with onsets × series length.
+With a colony_id column, periods are detected per colony: the search
+stops at the first row of the next colony (recovery not observed).
+
 Input:
     output/dataset/merged_dataset.csv
-    output/takeover_phase/onset_temperature_windows.csv
 
 Output:
     strict_takeover_periods.csv
 """
 
-import pandas as pd
 from pathlib import Path
 import numpy as np
 
+from lazy import lazy_import
+from step4_detect_takeover import GROUP_KEY
+from step5_onset_temp_windows import first_rows, onset_positions
+from storage import read_table, write_table
+
+pd = lazy_import("pandas")
+
 MERGED = Path("output/dataset/merged_dataset.csv")
-ONSET = Path("output/takeover_phase/onset_temperature_windows.csv")
 OUTDIR = Path("output/takeover_phase")
-OUTDIR.mkdir(parents=True, exist_ok=True)
 OUTFILE = OUTDIR / "strict_takeover_periods.csv"
 
+# Declared inputs / outputs (used by run_pipeline.py for caching)
+INPUTS = [MERGED]
+OUTPUTS = [OUTFILE]
 
-def main():
-    df = pd.read_csv(MERGED)
-    df["date"] = pd.to_datetime(df["date"])
+
+def detect_strict_takeover(merged, group_key=GROUP_KEY):
+    """
+    Return strict takeover periods for every onset in the merged table.
+    If the table has a group_key column (colony), all colonies are
+    processed in one pass and the key is kept in the output.
+    """
+    grouped = group_key in merged.columns
+    keys = [group_key, "date"] if grouped else ["date"]
+
+    df = merged.assign(date=pd.to_datetime(merged["date"]))
+    df = df.sort_values(keys, kind="stable").reset_index(drop=True)
+    first = first_rows(df[group_key].to_numpy()) if grouped else first_rows(np.zeros(len(df)))
 
     # Allow missing phase values to be NaN
-    df["phase_num"] = pd.to_numeric(df["phase_num"], errors='coerce')
-
-    onset_df = pd.read_csv(ONSET)
-    onset_df["onset_date"] = pd.to_datetime(onset_df["onset_date"])
-
-    results = []
-
-    for _, row in onset_df.iterrows():
-        onset_date = row["onset_date"]
-
-        # find onset index
-        idx_list = df.index[df["date"] == onset_date].tolist()
-        if len(idx_list) == 0:
-            print(f"[WARN] onset date not found: {onset_date}")
-            continue
-        start_idx = idx_list[0]
-
-        j = start_idx
-        n = len(df)
-
-        # expand forward: allow t or missing
-        while j + 1 < n:
-            next_phase = df.at[j + 1, "phase_num"]
-
-            if next_phase == 2 or np.isnan(next_phase):
-                j += 1
-                continue
-            else:
-                # recovery (o or p)
-                break
-
-        # recovery must be o/p
-        if j + 1 < n and df.at[j + 1, "phase_num"] in (0, 1):
-            end_idx = j
-            end_date = df.at[end_idx, "date"]
-            duration = (end_date - onset_date).days + 1
-
-            results.append({
-                "onset_date": onset_date.date(),
-                "end_date": end_date.date(),
-                "duration_strict": duration
-            })
-        else:
-            print(f"[WARN] strict recovery not found → skipping onset {onset_date.date()}")
-
-    pd.DataFrame(results).to_csv(OUTFILE, index=False)
-    print(f"[INFO] Saved strict takeover periods → {OUTFILE}")
+    phase = pd.to_numeric(df["phase_num"], errors='coerce').to_numpy(dtype=float)
+    dates = df["date"].to_numpy()
+
+    onsets = onset_positions(phase, first)
+
+    # expand forward: allow t or missing, stop at the first other row
+    # or at the start of the next group
+    stops = np.flatnonzero(~((phase == 2) | np.isnan(phase)) | first)
+    k = np.searchsorted(stops, onsets, side="right")
+    has_stop = k < len(stops)
+    stop = stops[np.minimum(k, len(stops) - 1)] if len(stops) else onsets
+
+    # recovery must be o/p, in the same group
+    recovered = has_stop & np.isin(phase[stop], (0, 1)) & ~first[stop]
+
+    for i in onsets[~recovered]:
+        onset_date = pd.Timestamp(dates[i])
+        where = f" ({df[group_key].iat[i]})" if grouped else ""
+        print(f"[WARN] strict recovery not found → skipping onset {onset_date.date()}{where}")
+
+    onset_date = dates[onsets[recovered]]
+    end_date = dates[stop[recovered] - 1]
+
+    periods = pd.DataFrame({
+        "onset_date": pd.Series(onset_date).dt.date,
+        "end_date": pd.Series(end_date).dt.date,
+        "duration_strict": (end_date - onset_date) // np.timedelta64(1, "D") + 1,
+    })
+
+    if grouped:
+        periods.insert(0, group_key, df[group_key].to_numpy()[onsets[recovered]])
+
+    return periods
+
+
+def save(results, outfile=OUTFILE):
+    outfile = write_table(results, outfile)
+    print(f"[INFO] Saved strict takeover periods → {outfile}")
+
+
+def load(path=OUTFILE, columns=None):
+    return read_table(path, columns)
+
+
+def main():
+    save(detect_strict_takeover(read_table(MERGED, [GROUP_KEY, "date", "phase_num"])))
 
 
 if __name__ == "__main__":
@@ -11,58 +11,119 @@ Input:
 Output:
     output/takeover_phase/phase_temperature_overview.svg
     output/takeover_phase/phase_temperature_overview.png
+
+The phase trace is drawn as one LineCollection per phase colour plus
+one for the dotted connectors at phase changes (instead of one Line2D
+per day), which keeps tight_layout and the SVG small for long series.
+
+With a colony_id column (multi-colony merged table), every colony gets
+its own panel, up to MAX_PANELS colonies; script/plot_facets.py draws
+one figure per colony.
 """
 
 from pathlib import Path
-import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+import numpy as np
+
+from lazy import lazy_import
+from profiling import timed
+from step4_detect_takeover import GROUP_KEY
+from storage import atomic_write, exists, read_table
+
+pd = lazy_import("pandas")
 
 DATASET_DIR = Path("output/dataset")
 TAKEOVER_DIR = Path("output/takeover_phase")
-TAKEOVER_DIR.mkdir(parents=True, exist_ok=True)
 
 MERGED = DATASET_DIR / "merged_dataset.csv"
+OUT_SVG = TAKEOVER_DIR / "phase_temperature_overview.svg"
+OUT_PNG = TAKEOVER_DIR / "phase_temperature_overview.png"
 
+# Declared inputs / outputs (used by run_pipeline.py for caching)
+INPUTS = [MERGED]
+OUTPUTS = [OUT_SVG, OUT_PNG]
 
-def main():
-    print("[INFO] Step7: Plotting phase × temperature overview")
 
-    if not MERGED.exists():
-        raise FileNotFoundError("merged_dataset.csv not found. Run step3 first.")
+PHASE_COLOR = {0: "gray", 1: "orange", 2: "red"}
 
-    df = pd.read_csv(MERGED)
-    df["date"] = pd.to_datetime(df["date"])
+# Most colonies drawn as panels of one overview figure
+MAX_PANELS = 12
 
-    PHASE_COLOR = {0: "gray", 1: "orange", 2: "red"}
 
-    fig, ax_phase = plt.subplots(figsize=(14, 4))
+def pyplot():
+    """matplotlib.pyplot with the Agg backend (imported on first use)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
 
-    # --- Draw phase lines ---
-    for i in range(len(df) - 1):
-        d0, y0 = df.at[i, "date"], df.at[i, "phase_num"]
-        d1, y1 = df.at[i + 1, "date"], df.at[i + 1, "phase_num"]
-
-        if pd.isna(y0) or pd.isna(y1):
-            continue
-
-        # horizontal line
-        ax_phase.plot(
-            [d0, d1],
-            [y0, y0],
-            color=PHASE_COLOR[y0],
-            linewidth=2.5,
+
+def phase_segments(dates, phase):
+    """
+    Segments of the phase trace as arrays.
+
+    Returns ({phase: (m, 2, 2) array of horizontal segments},
+             (k, 2, 2) array of vertical connectors at phase changes).
+    Days are joined when both have a phase.
+    """
+    import matplotlib.dates as mdates
+
+    x = mdates.date2num(pd.to_datetime(dates).to_numpy())
+    y = pd.to_numeric(phase, errors="coerce").to_numpy(dtype=float)
+
+    x0, x1 = x[:-1], x[1:]
+    y0, y1 = y[:-1], y[1:]
+    both = ~np.isnan(y0) & ~np.isnan(y1)
+
+    # horizontal line from each day to the next, at that day's phase;
+    # consecutive days of the same phase are joined into one segment
+    lines = {}
+    for ph in PHASE_COLOR:
+        run = np.concatenate([[False], both & (y0 == ph), [False]])
+        first = np.flatnonzero(run[1:] & ~run[:-1])
+        last = np.flatnonzero(run[:-1] & ~run[1:]) - 1
+        lines[ph] = np.stack(
+            [np.column_stack([x0[first], y0[first]]), np.column_stack([x1[last], y0[first]])],
+            axis=1,
         )
 
-        if y0 != y1:
-            ax_phase.plot(
-                [d1, d1],
-                [y0, y1],
-                color="lightgray",
-                linestyle="dotted",
-                linewidth=2.0,
-            )
+    change = both & (y0 != y1)
+    connectors = np.stack(
+        [np.column_stack([x1, y0]), np.column_stack([x1, y1])], axis=1
+    )[change]
+
+    return lines, connectors
+
+
+def draw_phase_lines(ax, dates, phase):
+    """Draw the phase trace: one LineCollection per phase colour + connectors."""
+    from matplotlib.collections import LineCollection
+
+    lines, connectors = phase_segments(dates, phase)
+
+    ax.xaxis_date()
+
+    ax.add_collection(LineCollection(
+        connectors,
+        colors="lightgray",
+        linestyles="dotted",
+        linewidths=2.0,
+    ))
+
+    for ph, segments in lines.items():
+        ax.add_collection(LineCollection(
+            segments,
+            colors=PHASE_COLOR[ph],
+            linewidths=2.5,
+            capstyle="projecting",
+        ))
+
+    ax.autoscale_view()
+
+
+def draw_overview(ax_phase, df, title=None):
+    """Draw the phase trace and the SST of a merged table (dates parsed) on ax_phase."""
+    # --- Draw phase lines ---
+    draw_phase_lines(ax_phase, df["date"], df["phase_num"])
 
     ax_phase.set_ylim(-0.3, 2.3)
     ax_phase.set_yticks([0, 1, 2])
@@ -70,6 +131,9 @@ def main():
     ax_phase.set_xlabel("Date")
     ax_phase.set_ylabel("Phase")
 
+    if title:
+        ax_phase.set_title(title)
+
     # --- Temperature axis ---
     ax_temp = ax_phase.twinx()
     ax_temp.plot(
@@ -80,17 +144,62 @@ def main():
     )
     ax_temp.set_ylabel("Sea surface temperature (°C)")
 
+
+def overview_figure(df, title=None):
+    """Build the phase × SST overview figure of a merged table (dates parsed)."""
+    fig, ax_phase = pyplot().subplots(figsize=(14, 4))
+    draw_overview(ax_phase, df, title)
+    fig.tight_layout()
+    return fig
+
+
+def colony_figure(df, group_key=GROUP_KEY, max_panels=MAX_PANELS):
+    """Overview figure with one panel per colony (the first max_panels colonies)."""
+    groups = list(df.groupby(group_key, sort=False))
+    if len(groups) > max_panels:
+        print(f"[WARN] {len(groups)} colonies: the overview shows the first {max_panels}; "
+              "run script/plot_facets.py for one figure per colony.")
+        groups = groups[:max_panels]
+
+    fig, axes = pyplot().subplots(len(groups), 1, figsize=(14, 3 * len(groups)), sharex=True, squeeze=False)
+    for ax_phase, (colony, part) in zip(axes[:, 0], groups):
+        draw_overview(ax_phase, part, title=str(colony))
+        if ax_phase is not axes[-1, 0]:
+            ax_phase.set_xlabel("")
+
     fig.tight_layout()
+    return fig
+
+
+def save_figure(fig, paths):
+    """Save a figure to every path (PNG at 300 dpi) and close it."""
+    for path in paths:
+        with timed("figure_save", item=Path(path).name), atomic_write(path) as tmp:
+            if Path(path).suffix == ".png":
+                fig.savefig(tmp, dpi=300)
+            else:
+                fig.savefig(tmp)
+        print(f"[INFO] Saved → {path}")
+    pyplot().close(fig)
+
 
-    out_svg = TAKEOVER_DIR / "phase_temperature_overview.svg"
-    out_png = TAKEOVER_DIR / "phase_temperature_overview.png"
+def plot_overview(merged, outdir=TAKEOVER_DIR, group_key=GROUP_KEY):
+    """Draw the phase × SST overview (a panel per colony) and save it as SVG and PNG."""
+    df = merged.assign(date=pd.to_datetime(merged["date"]))
+    if group_key in df.columns and df[group_key].nunique() > 1:
+        fig = colony_figure(df, group_key)
+    else:
+        fig = overview_figure(df)
+    save_figure(fig, [outdir / OUT_SVG.name, outdir / OUT_PNG.name])
+
+
+def main():
+    print("[INFO] Step7: Plotting phase × temperature overview")
 
-    fig.savefig(out_svg)
-    fig.savefig(out_png, dpi=300)
-    plt.close(fig)
+    if not exists(MERGED):
+        raise FileNotFoundError("merged dataset not found. Run step3 first.")
 
-    print(f"[INFO] Saved → {out_svg}")
-    print(f"[INFO] Saved → {out_png}")
+    plot_overview(read_table(MERGED, [GROUP_KEY, "date", "sst", "phase_num"]))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+storage.py
+-----------------------------------------
+Storage layer for the tables in output/dataset/ and output/takeover_phase/.
+
+Formats (IZU_TABLE_FORMAT environment variable, or run_pipeline.py --format):
+    csv      text CSV (default, as before)
+    parquet  typed columns, compressed; reads only the requested columns
+    feather  typed columns, uncompressed Arrow IPC, read memory-mapped
+
+Tables are addressed by their CSV path (e.g. output/dataset/DCP.csv);
+path_for() gives the file actually used for the current format.
+Binary formats store dates as datetime64 and the phase / colony_id /
+station columns as categoricals, so no step has to re-parse them.
+parquet and feather need pyarrow.
+
+Atomic writes:
+    Every file is written under a temporary name in its target directory
+    and renamed over the target only when complete (atomic_write), so an
+    interrupted run leaves the previous version or nothing — never a
+    partly written table.
+
+CSV export for sharing:
+    python3 script/storage.py export-csv
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+from lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+FORMAT = os.environ.get("IZU_TABLE_FORMAT", "csv")
+
+TABLE_DIRS = [Path("output/dataset"), Path("output/takeover_phase"), Path("output/sensitivity")]
+
+# Columns stored as categoricals in binary formats
+CATEGORICAL = ("phase", "colony_id", "station")
+
+# CSV files written with a BOM (as step1 does)
+BOM_TABLES = ("CDST.csv",)
+
+
+def set_format(fmt):
+    """Select the table format for this process and its child processes."""
+    global FORMAT
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown table format: {fmt} (choose from {', '.join(FORMATS)})")
+    FORMAT = fmt
+    os.environ["IZU_TABLE_FORMAT"] = fmt
+
+
+def path_for(path, fmt=None):
+    """File used for a table (given by its CSV path) in the given format."""
+    path = Path(path)
+    if path.suffix != ".csv":
+        return path
+    return path.with_suffix(FORMATS[fmt or FORMAT])
+
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(
+            f"The '{FORMAT}' table format needs pyarrow (pip install pyarrow); "
+            "use --format csv otherwise."
+        ) from None
+    return pyarrow
+
+
+def typed(df, categories=True):
+    """Typed copy of a table for binary storage."""
+    out = df.copy()
+    for col in out.columns:
+        if col == "date" or col.endswith("_date"):
+            out[col] = pd.to_datetime(out[col])
+        elif categories and col in CATEGORICAL:
+            out[col] = out[col].astype("category")
+    return out
+
+
+def temp_path(path):
+    """Temporary name next to path (same suffix, so writers infer the same format)."""
+    path = Path(path)
+    return path.with_name(f".{path.stem}.tmp{os.getpid()}{path.suffix}")
+
+
+@contextmanager
+def atomic_write(path):
+    """
+    Yield a temporary path to write to instead of path; it replaces path
+    when the block completes and is removed if the block fails.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = temp_path(path)
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def write_table(df, path, encoding="utf-8"):
+    """Write a table in the current format; returns the file written."""
+    target = path_for(path)
+
+    with atomic_write(target) as tmp:
+        if FORMAT == "csv":
+            df.to_csv(tmp, index=False, encoding=encoding)
+        elif FORMAT == "parquet":
+            _arrow()
+            typed(df).to_parquet(tmp, index=False)
+        else:
+            pa = _arrow()
+            table = pa.Table.from_pandas(typed(df), preserve_index=False)
+            pa.feather.write_feather(table, tmp, compression="uncompressed")
+
+    return target
+
+
+def _available(target):
+    if FORMAT == "csv":
+        return list(pd.read_csv(target, nrows=0, encoding="utf-8-sig").columns)
+    pa = _arrow()
+    if FORMAT == "parquet":
+        return pa.parquet.read_schema(target).names
+    return pa.ipc.open_file(pa.memory_map(str(target))).schema.names
+
+
+def read_table(path, columns=None):
+    """
+    Read a table in the current format. With columns, only those columns
+    are read (names missing from the file are ignored).
+    """
+    target = path_for(path)
+
+    if columns is not None:
+        available = _available(target)
+        columns = [c for c in columns if c in available]
+
+    if FORMAT == "csv":
+        # round_trip: floats read back exactly as they were written
+        return pd.read_csv(target, usecols=columns, encoding="utf-8-sig", float_precision="round_trip")
+
+    pa = _arrow()
+    if FORMAT == "parquet":
+        table = pa.parquet.read_table(target, columns=columns, memory_map=True)
+    else:
+        table = pa.feather.read_table(target, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def exists(path):
+    return path_for(path).exists()
+
+
+class ChunkWriter:
+    """
+    Write a table chunk by chunk in the current format. The chunks go to
+    a temporary file that replaces the table on close(); discard() drops
+    it and leaves the previous table in place.
+    """
+
+    def __init__(self, path, encoding="utf-8"):
+        self.path = path_for(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp = temp_path(self.path)
+        self.encoding = encoding
+        self.started = False
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+    def write(self, df):
+        if FORMAT == "csv":
+            if self.started:
+                df.to_csv(self.tmp, mode="a", header=False, index=False, encoding="utf-8")
+            else:
+                df.to_csv(self.tmp, mode="w", index=False, encoding=self.encoding)
+        else:
+            pa = _arrow()
+            table = pa.Table.from_pandas(typed(df, categories=False), schema=self._schema,
+                                         preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                if FORMAT == "parquet":
+                    self._writer = pa.parquet.ParquetWriter(self.tmp, self._schema)
+                else:
+                    options = pa.ipc.IpcWriteOptions(compression=None)
+                    self._writer = pa.ipc.new_file(str(self.tmp), self._schema, options=options)
+            self._writer.write_table(table)
+
+        self.started = True
+        self.rows += len(df)
+
+    def _close_writer(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def close(self):
+        """Finish the table and move it into place."""
+        self._close_writer()
+        if self.started and self.tmp.exists():
+            os.replace(self.tmp, self.path)
+
+    def discard(self):
+        """Drop what was written (the previous table stays in place)."""
+        self._close_writer()
+        self.tmp.unlink(missing_ok=True)
+
+
+def export_csv(fmt=None):
+    """Write a .csv copy next to every stored table of the given format."""
+    suffix = FORMATS[fmt or FORMAT]
+    written = []
+    for directory in TABLE_DIRS:
+        for target in sorted(directory.glob(f"*{suffix}")):
+            csv = target.with_suffix(".csv")
+            encoding = "utf-8-sig" if csv.name in BOM_TABLES else "utf-8"
+            df = read_table(csv)
+            with atomic_write(csv) as tmp:
+                df.to_csv(tmp, index=False, encoding=encoding)
+            written.append(csv)
+            print(f"[INFO] Exported → {csv}")
+    return written
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "export-csv":
+        print("Usage: python3 script/storage.py export-csv")
+        return
+
+    if FORMAT == "csv":
+        print("[INFO] Tables are already stored as CSV (IZU_TABLE_FORMAT=csv).")
+        return
+
+    export_csv()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+streaming.py
+-----------------------------------------
+Bounded-memory (streaming) mode for step1 → step6.
+
+The data never has to fit in memory at once: every table is read,
+processed and written in date-ordered chunks.
+
+    step1  one chunk per PDF (temp/ files are processed in date order)
+    step2  photo_list.csv read in chunks of CHUNKSIZE rows
+    step3  sorted merge: each CDST chunk is joined with the DCP rows
+           up to its last date; later DCP rows wait in a small buffer
+    step4  general takeover periods (TakeoverStream)
+    step5  onset temperature windows (OnsetWindowStream)
+    step6  strict takeover periods (TakeoverStream, strict=True)
+
+Step4–6 carry their state across chunk boundaries (previous phase, a
+takeover period that is still open, the last SST values of a window),
+so the results are the same as in the in-memory pipeline.
+
+Requirements:
+    - photo_list.csv sorted by date
+    - one colony: no colony_id column (a multi-colony list needs the
+      in-memory mode, which handles every colony separately)
+    - row-based onset windows (calendar windows need the in-memory mode)
+
+Outputs: the same tables as step1–step6 (SST_stations.npz and the
+figure are not produced in this mode; logger files are not read).
+
+Usage:
+    python3 run_pipeline.py --streaming [--chunksize N]
+"""
+
+import numpy as np
+
+from lazy import lazy_import
+import loggers
+import step1_extract_sst as step1
+import step2_build_dcp as step2
+import step3_merge as step3
+import step4_detect_takeover as step4
+import step5_onset_temp_windows as step5
+import step6_detect_strict_takeover as step6
+from step4_detect_takeover import takeover_runs
+from step5_onset_temp_windows import onset_positions, rolling_stats
+from storage import ChunkWriter
+
+pd = lazy_import("pandas")
+
+# Rows of photo_list.csv per chunk
+CHUNKSIZE = 10_000
+
+
+def check_order(chunks, name):
+    """Pass chunks through, failing if dates go backwards between chunks."""
+    last = None
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        if last is not None and chunk["date"].iloc[0] < last:
+            raise ValueError(f"{name} is not sorted by date (at {chunk['date'].iloc[0].date()})")
+        last = chunk["date"].iloc[-1]
+        yield chunk
+
+
+def stream_cdst(pdf_paths=None, jobs=None, station=step1.TARGET_STATION_JP):
+    """CDST chunks, one per PDF."""
+    if pdf_paths is None:
+        pdf_paths = sorted(step1.TEMP_DIR.glob("*.pdf"))
+    if loggers.logger_files():
+        print(f"[WARN] Streaming mode reads only the PDFs; the files in {loggers.LOGGER_DIR}/ are ignored.")
+
+    chunks = (
+        step1.select_station(step1.stations_frame(extracted), station, trim=False)
+        for extracted in step1.iter_extracted(pdf_paths, jobs=jobs)
+        if len(extracted[1]) > 0 and station in extracted[0]
+    )
+    return check_order(chunks, "temp/*.pdf")
+
+
+def stream_dcp(photo_list=step2.PHOTO_LIST, chunksize=CHUNKSIZE):
+    """DCP chunks read from photo_list.csv (checked for a colony_id column at once)."""
+    if not photo_list.exists():
+        raise FileNotFoundError("photo_list.csv not found in current directory.")
+    if step4.GROUP_KEY in pd.read_csv(photo_list, nrows=0).columns:
+        raise ValueError(f"{photo_list} has a {step4.GROUP_KEY} column; streaming mode handles one colony "
+                         "only → run without --streaming")
+
+    def chunks():
+        for raw in pd.read_csv(photo_list, chunksize=chunksize):
+            if "date" not in raw.columns or "phase" not in raw.columns:
+                raise ValueError("photo_list.csv must contain columns: date, phase")
+            yield step2.to_dcp(raw).sort_values("date", kind="stable")
+
+    return check_order(chunks(), "photo_list.csv")
+
+
+def merge_sorted(cdst_chunks, dcp_chunks):
+    """
+    Left-merge date-sorted DCP chunks onto date-sorted CDST chunks.
+    Yields one merged chunk per CDST chunk; DCP chunks are consumed
+    only as far as the current CDST date.
+    """
+    dcp_iter = iter(dcp_chunks)
+    pending = []
+    exhausted = False
+
+    # empty DCP frame (gets the real columns once a DCP chunk is seen)
+    template = pd.DataFrame({
+        "date": pd.Series(dtype="datetime64[ns]"),
+        "phase_num": pd.Series(dtype=float),
+    })
+
+    for sst in cdst_chunks:
+        last = sst["date"].iloc[-1]
+
+        while not exhausted and (not pending or pending[-1]["date"].iloc[-1] <= last):
+            try:
+                pending.append(next(dcp_iter))
+            except StopIteration:
+                exhausted = True
+
+        if pending:
+            buffer = pd.concat(pending)
+            template = buffer.iloc[0:0]
+        else:
+            buffer = template
+
+        take = buffer[buffer["date"] <= last]
+        rest = buffer[buffer["date"] > last]
+        pending = [rest] if len(rest) else []
+
+        merged = pd.merge(sst, take, on="date", how="left")
+        merged["phase_num"] = merged["phase_num"].astype(float)
+        yield merged
+
+    # drain the DCP side so that everything reading it sees every row
+    for _ in dcp_iter:
+        pass
+
+
+class TakeoverStream:
+    """
+    Takeover periods of a date-ordered phase series fed chunk by chunk.
+
+    strict=False : general periods as in step4
+    strict=True  : strict periods as in step6 (onset after an o/p row,
+                   kept only if recovery to o/p follows)
+    """
+
+    def __init__(self, strict=False):
+        self.strict = strict
+        self.prev = None          # phase of the last row seen
+        self.open_start = None    # start of a period still running
+        self.open_end = None      # last row of that period so far
+        self.periods = []
+
+    def _close(self, start, end, stop_phase):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if self.strict and stop_phase not in (0, 1):
+            print(f"[WARN] strict recovery not found → skipping onset {start.date()}")
+            return
+        self.periods.append((start.date(), end.date(), (end - start).days + 1))
+
+    def feed(self, dates, phase):
+        dates = pd.to_datetime(pd.Series(dates)).to_numpy()
+        phase = pd.to_numeric(pd.Series(phase), errors="coerce").to_numpy(dtype=float)
+        if len(phase) == 0:
+            return
+
+        offset = 0
+
+        # continue a period left open by the previous chunk
+        if self.open_start is not None:
+            stops = np.flatnonzero(~((phase == 2) | np.isnan(phase)))
+            if len(stops) == 0:
+                self.open_end = dates[-1]
+                self.prev = phase[-1]
+                return
+
+            offset = stops[0]
+            end = dates[offset - 1] if offset > 0 else self.open_end
+            self._close(self.open_start, end, phase[offset])
+            self.open_start = None
+
+        prev = phase[offset - 1] if offset > 0 else self.prev
+        ph = np.concatenate([[np.nan if prev is None else prev], phase[offset:]])
+        dt = dates[offset:]
+
+        # row 0 is the previous row (context only)
+        first = np.zeros(len(ph), dtype=bool)
+        first[0] = True
+        if prev is None and not self.strict:
+            first[1] = True
+
+        starts, ends = takeover_runs(ph, first)
+
+        for s, e in zip(starts, ends):
+            if s == 0:
+                continue
+            if e == len(ph) - 1:
+                self.open_start, self.open_end = dt[s - 1], dt[e - 1]
+            else:
+                self._close(dt[s - 1], dt[e - 1], ph[e + 1])
+
+        self.prev = phase[-1]
+
+    def finish(self):
+        if self.open_start is not None:
+            if self.strict:
+                start = pd.Timestamp(self.open_start)
+                print(f"[WARN] strict recovery not found → skipping onset {start.date()}")
+            else:
+                self._close(self.open_start, self.open_end, None)
+            self.open_start = None
+
+        columns = (
+            ["onset_date", "end_date", "duration_strict"] if self.strict
+            else ["start_date", "end_date", "duration_general"]
+        )
+        return pd.DataFrame(self.periods, columns=columns)
+
+
+class OnsetWindowStream:
+    """Onset temperature windows (row-based) of a merged series fed chunk by chunk."""
+
+    def __init__(self, sizes=step5.WINDOWS, stats=step5.STATS):
+        self.sizes = sizes
+        self.stats = stats
+        self.tail = np.empty(0)   # last max(sizes)-1 SST values
+        self.prev = np.nan        # phase of the last row seen
+        self.frames = []
+
+    def feed(self, dates, sst, phase):
+        sst = np.asarray(sst, dtype=float)
+        phase = np.asarray(phase, dtype=float)
+        if len(phase) == 0:
+            return
+
+        values = np.concatenate([self.tail, sst])
+        onsets = onset_positions(np.concatenate([[self.prev], phase])) - 1
+
+        if len(onsets):
+            rolled = rolling_stats(values, self.sizes, self.stats)
+            rows = onsets + len(self.tail)
+            out = pd.DataFrame({"onset_date": pd.Series(np.asarray(dates)[onsets]).dt.date})
+            for size in self.sizes:
+                for stat in self.stats:
+                    out[f"w{size}_{stat}"] = rolled[(size, stat)][rows]
+            self.frames.append(out)
+
+        keep = max(self.sizes) - 1
+        self.tail = values[max(0, len(values) - keep):]
+        self.prev = phase[-1]
+
+    def finish(self):
+        columns = ["onset_date"] + [f"w{w}_{k}" for w in self.sizes for k in self.stats]
+        if not self.frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(self.frames, ignore_index=True)
+
+
+def run_streaming(chunksize=CHUNKSIZE, jobs=None, station=step1.TARGET_STATION_JP):
+    """Run step1–step6 chunk by chunk and write their output tables."""
+    try:
+        dcp_stream = stream_dcp(chunksize=chunksize)
+    except ValueError as exc:
+        print(f"[ERROR] {exc}")
+        return False
+
+    cdst_out = ChunkWriter(step1.OUTFILE, encoding="utf-8-sig")
+    dcp_out = ChunkWriter(step2.OUTFILE)
+    merged_out = ChunkWriter(step3.OUTFILE)
+
+    general = TakeoverStream()
+    strict = TakeoverStream(strict=True)
+    windows = OnsetWindowStream()
+
+    def cdst_chunks():
+        for chunk in stream_cdst(jobs=jobs, station=station):
+            cdst_out.write(chunk)
+            yield chunk
+
+    def dcp_chunks():
+        for chunk in dcp_stream:
+            dcp_out.write(chunk)
+            general.feed(chunk["date"], chunk["phase_num"])
+            yield chunk
+
+    writers = (cdst_out, dcp_out, merged_out)
+    try:
+        for merged in merge_sorted(cdst_chunks(), dcp_chunks()):
+            merged_out.write(merged)
+            windows.feed(merged["date"], merged["sst"], merged["phase_num"])
+            strict.feed(merged["date"], merged["phase_num"])
+    except BaseException:
+        # keep the tables of the previous run rather than partial ones
+        for writer in writers:
+            writer.discard()
+        raise
+    for writer in writers:
+        writer.close()
+
+    if not cdst_out.started:
+        print("[ERROR] No SST records extracted.")
+        return False
+
+    print(f"[INFO] Saved {cdst_out.path.name} with {cdst_out.rows} rows → {cdst_out.path}")
+    print(f"[INFO] DCP dataset saved → {dcp_out.path} ({dcp_out.rows} records)")
+    print(f"[INFO] Saved merged dataset → {merged_out.path} ({merged_out.rows} rows)")
+
+    step4.save(general.finish())
+    step5.save(windows.finish())
+    step6.save(strict.finish())
+
+    return True
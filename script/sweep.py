@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+sweep.py
+-----------------------------------------
+Sensitivity of the takeover results to their definitions.
+
+Parameters:
+    definition  general (step4) or strict (step6) periods
+    partial     whether partial (p) days count as takeover days
+    max_gap     longest run of missing days bridged inside a period:
+                1 … MAX_GAP days, or unlimited (as in step4 / step6)
+    window      onset SST window of 1 … MAX_WINDOW rows (as step5,
+                row-based: the period start and the rows before it)
+
+Definitions, on the days of the merged series:
+    general  a period starts on a takeover day whose previous observed
+             day is o (or p, if p is not takeover), or that is the first
+             observed day; it ends on the last takeover day before the
+             next other observed day.
+    strict   a period starts at an onset (o/p → t on consecutive rows)
+             and needs recovery: the next observed o/p day. It ends on
+             the day before recovery.
+    A run of missing days longer than max_gap ends a period like the
+    end of the data: a general period ends before it and starts again
+    after it; a strict period is dropped (recovery not observed).
+    With partial off and max_gap unlimited the periods are the ones of
+    step4 and step6.
+
+Method:
+    What does not depend on the parameters is computed once per series
+    (SweepSeries): the observed days and the gaps between them, the runs
+    of missing days, and the cumulative sums (SST, valid days,
+    degree-days) and trailing min / max of every row for every window
+    size. Each (definition, partial, max_gap) then costs a few binary
+    searches (takeover_runs of step4 on the observed days; onset and
+    recovery search of step6), and the statistics of all window sizes
+    are read off the precomputed arrays at the period starts at once.
+
+Output (one row per colony × definition × partial × max_gap × window):
+    output/sensitivity/takeover_sweep.csv
+        [colony_id,] definition, partial, max_gap (empty = unlimited),
+        window, periods, takeover_days, mean_duration, median_duration,
+        max_duration, onset_mean, onset_min, onset_max, onset_degdays
+        (onset_*: window statistic at the period start, averaged over
+        the periods)
+    output/sensitivity/takeover_sweep_periods.csv  (--periods)
+        every period of every definition × partial × max_gap
+
+Usage:
+    python3 script/sweep.py [--max-gap N] [--max-window N] [--periods]
+"""
+
+import argparse
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from lazy import lazy_import
+from step4_detect_takeover import GROUP_KEY, takeover_runs
+from step5_onset_temp_windows import DEGREE_DAY_BASE, MERGED, onset_positions
+from storage import exists, read_table, write_table
+
+pd = lazy_import("pandas")
+
+OUTDIR = Path("output/sensitivity")
+OUTFILE = OUTDIR / "takeover_sweep.csv"
+PERIODS_FILE = OUTDIR / "takeover_sweep_periods.csv"
+
+DEFINITIONS = ("general", "strict")
+PARTIAL = (False, True)
+MAX_GAP = 14
+MAX_WINDOW = 30
+STATS = ("mean", "min", "max", "degdays")
+
+
+class SweepSeries:
+    """The parameter-independent arrays of one merged series."""
+
+    def __init__(self, merged, max_window=MAX_WINDOW, degree_day_base=DEGREE_DAY_BASE):
+        df = merged.assign(date=pd.to_datetime(merged["date"])).sort_values("date", kind="stable")
+        self.dates = df["date"].to_numpy()
+        phase = pd.to_numeric(df["phase_num"], errors="coerce").to_numpy(dtype=float)
+        sst = df["sst"].to_numpy(dtype=float)
+
+        # phase coding of each partial setting (p counted as t → 1 becomes 2)
+        self.phase = {False: phase, True: np.where(phase == 1, 2.0, phase)}
+
+        # observed rows and the missing days before each of them
+        self.observed = np.flatnonzero(~np.isnan(phase))
+        self.gap_before = np.diff(self.observed, prepend=-1) - 1
+
+        # runs of missing rows
+        edges = np.diff(np.r_[0, np.isnan(phase).astype(np.int8), 0])
+        self.gap_start = np.flatnonzero(edges == 1)
+        self.gap_length = np.flatnonzero(edges == -1) - self.gap_start
+
+        # cumulative sums for window means and degree-days
+        valid = ~np.isnan(sst)
+        filled = np.where(valid, sst, 0.0)
+        self.csum = np.r_[0.0, np.cumsum(filled)]
+        self.ccount = np.r_[0, np.cumsum(valid)]
+        self.cdeg = np.r_[0.0, np.cumsum(np.where(valid, np.clip(filled - degree_day_base, 0, None), 0.0))]
+
+        # trailing min / max of every row for every window size
+        # (column w-1: rows i-w+1 .. i)
+        padded = np.r_[np.full(max_window - 1, np.nan), sst]
+        view = sliding_window_view(padded, max_window)[:, ::-1]
+        self.wmin = np.fmin.accumulate(view, axis=1)
+        self.wmax = np.fmax.accumulate(view, axis=1)
+
+    def general(self, partial=False, max_gap=None):
+        """Start / end rows of the general takeover periods."""
+        obs = self.observed
+        first = np.zeros(len(obs), dtype=bool)
+        first[:1] = True
+        if max_gap is not None:
+            first |= self.gap_before > max_gap
+
+        starts, ends = takeover_runs(self.phase[partial][obs], first)
+        return obs[starts], obs[ends]
+
+    def strict(self, partial=False, max_gap=None):
+        """Start / end rows of the strict takeover periods (recovered onsets only)."""
+        phase = self.phase[partial]
+        onsets = onset_positions(phase)
+
+        # first row after each onset that is neither takeover nor a bridged gap
+        stops = np.flatnonzero(~((phase == 2) | np.isnan(phase)))
+        if max_gap is not None:
+            stops = np.union1d(stops, self.gap_start[self.gap_length > max_gap])
+        k = np.searchsorted(stops, onsets, side="right")
+        stop = stops[np.minimum(k, len(stops) - 1)] if len(stops) else onsets
+
+        recovered = (k < len(stops)) & np.isin(phase[stop], (0, 1))
+        return onsets[recovered], stop[recovered] - 1
+
+    def window_stats(self, rows, windows):
+        """{stat: array (rows × windows)} of the trailing windows ending at rows."""
+        windows = np.asarray(windows)
+        hi = rows[:, None] + 1
+        lo = np.maximum(hi - windows[None, :], 0)
+        count = self.ccount[hi] - self.ccount[lo]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (self.csum[hi] - self.csum[lo]) / count
+        return {
+            "mean": np.where(count > 0, mean, np.nan),
+            "min": self.wmin[rows][:, windows - 1],
+            "max": self.wmax[rows][:, windows - 1],
+            "degdays": np.where(count > 0, self.cdeg[hi] - self.cdeg[lo], np.nan),
+        }
+
+
+def _sweep_series(series, max_gaps, windows, partial, definitions):
+    """Summary blocks and period blocks (lists of DataFrames) of one series."""
+    windows = np.asarray(windows)
+    summary, periods = [], []
+
+    for definition in definitions:
+        find = series.general if definition == "general" else series.strict
+        for part in partial:
+            for gap in max_gaps:
+                starts, ends = find(part, gap)
+                days = (series.dates[ends] - series.dates[starts]) // np.timedelta64(1, "D") + 1
+
+                block = {
+                    "definition": definition,
+                    "partial": part,
+                    "max_gap": gap,
+                    "window": windows,
+                    "periods": len(starts),
+                    "takeover_days": int(days.sum()),
+                    "mean_duration": days.mean() if len(days) else np.nan,
+                    "median_duration": np.median(days) if len(days) else np.nan,
+                    "max_duration": days.max() if len(days) else np.nan,
+                }
+                stats = series.window_stats(starts, windows)
+                with warnings.catch_warnings():
+                    # no period, or no SST in a window: NaN
+                    warnings.simplefilter("ignore", category=RuntimeWarning)
+                    for stat in STATS:
+                        block[f"onset_{stat}"] = np.nanmean(stats[stat], axis=0)
+                summary.append(pd.DataFrame(block))
+
+                periods.append(pd.DataFrame({
+                    "definition": definition,
+                    "partial": part,
+                    "max_gap": gap,
+                    "start_date": pd.Series(series.dates[starts]).dt.date,
+                    "end_date": pd.Series(series.dates[ends]).dt.date,
+                    "duration": days,
+                }))
+
+    return summary, periods
+
+
+def sweep(merged, max_gaps=None, windows=None, partial=PARTIAL, definitions=DEFINITIONS,
+          group_key=GROUP_KEY, with_periods=False):
+    """
+    Takeover results of every parameter combination as one tidy table.
+
+    max_gaps : bridged-gap limits (None = unlimited); default 1 … MAX_GAP and None
+    windows  : onset window sizes; default 1 … MAX_WINDOW
+    With with_periods, returns (summary, periods).
+    """
+    if max_gaps is None:
+        max_gaps = list(range(1, MAX_GAP + 1)) + [None]
+    if windows is None:
+        windows = range(1, MAX_WINDOW + 1)
+    windows = list(windows)
+
+    groups = merged.groupby(group_key, sort=False) if group_key in merged.columns else [(None, merged)]
+
+    summary, periods = [], []
+    for colony, frame in groups:
+        series = SweepSeries(frame, max_window=max(windows))
+        s, p = _sweep_series(series, max_gaps, windows, partial, definitions)
+        if colony is not None:
+            s = [b.assign(**{group_key: colony}) for b in s]
+            p = [b.assign(**{group_key: colony}) for b in p]
+        summary += s
+        periods += p
+
+    def table(blocks):
+        df = pd.concat(blocks, ignore_index=True)
+        df["max_gap"] = df["max_gap"].astype("Int64")
+        if group_key in df.columns:
+            df.insert(0, group_key, df.pop(group_key))
+        return df
+
+    if with_periods:
+        return table(summary), table(periods)
+    return table(summary)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the takeover definitions and onset windows.")
+    parser.add_argument("--max-gap", type=int, default=MAX_GAP,
+                        help=f"largest bridged gap in days (1 … N, plus unlimited; default {MAX_GAP})")
+    parser.add_argument("--max-window", type=int, default=MAX_WINDOW,
+                        help=f"largest onset window in rows (1 … N; default {MAX_WINDOW})")
+    parser.add_argument("--periods", action="store_true",
+                        help=f"also write every period to {PERIODS_FILE.name}")
+    args = parser.parse_args()
+
+    if not exists(MERGED):
+        raise FileNotFoundError("merged dataset not found. Run step3 first.")
+
+    merged = read_table(MERGED, [GROUP_KEY, "date", "sst", "phase_num"])
+    max_gaps = list(range(1, args.max_gap + 1)) + [None]
+    windows = range(1, args.max_window + 1)
+
+    started = time.perf_counter()
+    summary, periods = sweep(merged, max_gaps, windows, with_periods=True)
+    print(f"[INFO] Evaluated {len(summary)} combinations in {time.perf_counter() - started:.2f} s")
+
+    outfile = write_table(summary, OUTFILE)
+    print(f"[INFO] Saved sensitivity sweep → {outfile}")
+    if args.periods:
+        outfile = write_table(periods, PERIODS_FILE)
+        print(f"[INFO] Saved {len(periods)} periods → {outfile}")
+
+
+if __name__ == "__main__":
+    main()
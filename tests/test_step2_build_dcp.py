@@ -0,0 +1,25 @@
+"""step2: rows without a valid phase are dropped, the others kept."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "script"))
+
+import pandas as pd
+
+import step2_build_dcp as step2
+
+
+def test_partially_annotated_list(tmp_path, capsys):
+    photo_list = tmp_path / "photo_list.csv"
+    pd.DataFrame({
+        "photo_id": [f"{d}.JPG" for d in range(20240101, 20240107)],
+        "date": range(20240101, 20240107),
+        "phase": ["o", "T ", "", "duplication", "2", "x"],
+    }).to_csv(photo_list, index=False)
+
+    dcp = step2.build_dcp(photo_list)
+
+    assert dcp["date"].dt.day.tolist() == [1, 2, 5]
+    assert dcp["phase_num"].tolist() == [0, 2, 2]
+    assert "[WARN] 3 of 6 photo_list rows" in capsys.readouterr().out